@@ -0,0 +1,128 @@
+"""Multi-worker check: two uvicorn workers sharing a RESP backplane.
+
+Starts benchmarks/resp_server.py, two workers on throwaway SQLite files, seeds
+two users in one conversation, connects one user to each worker and checks
+that a chat_message sent through worker A reaches the socket on worker B:
+
+    python benchmarks/backplane_harness.py
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP_DIR = tempfile.mkdtemp(prefix="backplane_harness_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'app.db')}"
+os.environ["CHAT_DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'chat.db')}"
+os.environ["ARCHIVE_DB_PATH"] = os.path.join(TMP_DIR, "archive.db")
+sys.path.insert(0, BACKEND_DIR)
+
+import socketio  # noqa: E402
+
+from core.security import create_access_token  # noqa: E402
+from database.session import SessionLocal, init_db  # noqa: E402
+from database.models import User  # noqa: E402
+from websocket.services import ChatService  # noqa: E402
+
+
+def seed() -> tuple[list[User], int]:
+    init_db()
+    db = SessionLocal()
+    try:
+        users = [
+            User(email=f"worker{i}@example.com", username=f"worker{i}", first_name="Worker",
+                 last_name=str(i), hashed_password="x")
+            for i in range(2)
+        ]
+        db.add_all(users)
+        db.commit()
+        for user in users:
+            db.refresh(user)
+        db.expunge_all()
+    finally:
+        db.close()
+    conversation = ChatService.create_conversation([u.id for u in users], name="backplane")
+    return users, conversation.id
+
+
+def start_process(args: list[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen(args, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+
+def wait_http(url: str, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def check(ports: list[int], users: list[User], conversation_id: int, timeout: float) -> bool:
+    received: dict[str, asyncio.Future] = {
+        "chat_message": asyncio.get_running_loop().create_future(),
+        "conversation_updated": asyncio.get_running_loop().create_future(),
+    }
+    sender, receiver = socketio.AsyncClient(), socketio.AsyncClient()
+
+    for event, future in received.items():
+        receiver.on(event, lambda data, future=future: future.done() or future.set_result(data))
+
+    await sender.connect(f"http://127.0.0.1:{ports[0]}", auth={"token": create_access_token(users[0].email)},
+                         transports=["websocket"])
+    await receiver.connect(f"http://127.0.0.1:{ports[1]}", auth={"token": create_access_token(users[1].email)},
+                           transports=["websocket"])
+    try:
+        await sender.emit("chat_message", {"conversation_id": conversation_id, "content": "across workers"})
+        ok = True
+        for event, future in received.items():
+            try:
+                data = await asyncio.wait_for(future, timeout)
+                print(f"worker :{ports[1]} received {event}: {data}")
+            except asyncio.TimeoutError:
+                print(f"worker :{ports[1]} did NOT receive {event}")
+                ok = False
+        return ok
+    finally:
+        await sender.disconnect()
+        await receiver.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ports", type=int, nargs=2, default=[8101, 8102])
+    parser.add_argument("--backplane-port", type=int, default=6390)
+    parser.add_argument("--timeout", type=float, default=5)
+    args = parser.parse_args()
+
+    users, conversation_id = seed()
+    env = {**os.environ, "BACKPLANE_URL": f"redis://127.0.0.1:{args.backplane_port}/0"}
+    processes = [start_process(
+        [sys.executable, os.path.join("benchmarks", "resp_server.py"), "--port", str(args.backplane_port)], env
+    )]
+    try:
+        time.sleep(0.5)
+        for port in args.ports:
+            processes.append(start_process(
+                [sys.executable, "-m", "uvicorn", "main:socket_app", "--port", str(port)], env
+            ))
+        for port in args.ports:
+            wait_http(f"http://127.0.0.1:{port}/health")
+        ok = asyncio.run(check(args.ports, users, conversation_id, args.timeout))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Benchmark: memory and speed of the connection registry at 10k and 100k sessions.
+
+Registers synthetic sessions (about one user in five has a second tab) and
+measures the heap growth with tracemalloc, for the registry alone and for
+ConnectionService.connect as a whole (which also tracks last-seen and
+presence per user). The old dict-of-sets plus reverse-dict layout is
+measured the same way for comparison. Session id strings are created
+before measuring, since Engine.IO owns them either way:
+
+    python benchmarks/bench_connection_registry.py --sizes 10000 100000
+"""
+import argparse
+import asyncio
+import base64
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from websocket.services import ConnectionService  # noqa: E402
+
+
+class SetRegistry:
+    """The previous layout: user -> set of sids, and sid -> user"""
+
+    def __init__(self):
+        self.active_connections = {}
+        self.user_by_session = {}
+
+    def _register(self, user_id, session_id):
+        if user_id not in self.active_connections:
+            self.active_connections[user_id] = set()
+        self.active_connections[user_id].add(session_id)
+        self.user_by_session[session_id] = user_id
+
+    def _unregister(self, session_id):
+        user_id = self.user_by_session.pop(session_id, None)
+        sessions = self.active_connections.get(user_id)
+        if sessions is not None:
+            sessions.discard(session_id)
+            if not sessions:
+                del self.active_connections[user_id]
+
+    def get_user_sessions(self, user_id):
+        return list(self.active_connections.get(user_id, set()))
+
+
+def synthetic_sessions(count: int) -> list[tuple[int, str]]:
+    """(user_id, sid) pairs; sids look like Engine.IO's 20-character ids"""
+    pairs = []
+    user_id = 0
+    while len(pairs) < count:
+        user_id += 1
+        for _ in range(2 if user_id % 5 == 0 else 1):
+            pairs.append((user_id, base64.urlsafe_b64encode(os.urandom(15)).decode()))
+    return pairs[:count]
+
+
+def measure(build) -> tuple[object, int]:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    registry = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return registry, after - before
+
+
+def time_ops(registry, pairs: list[tuple[int, str]]) -> tuple[float, float, float]:
+    """Microseconds per unregister, register and session lookup"""
+    sample = pairs[::10]
+    start = time.perf_counter()
+    for _, sid in sample:
+        registry._unregister(sid)
+    unregister = time.perf_counter() - start
+    start = time.perf_counter()
+    for user_id, sid in sample:
+        registry._register(user_id, sid)
+    register = time.perf_counter() - start
+    start = time.perf_counter()
+    for user_id, _ in pairs:
+        for _ in registry.get_user_sessions(user_id):
+            pass
+    lookup = time.perf_counter() - start
+    return (unregister / len(sample) * 1e6, register / len(sample) * 1e6, lookup / len(pairs) * 1e6)
+
+
+def build_registry(factory, pairs):
+    def build():
+        registry = factory()
+        for user_id, sid in pairs:
+            registry._register(user_id, sid)
+        return registry
+    return build
+
+
+def build_service(pairs):
+    def build():
+        service = ConnectionService()
+
+        async def connect_all():
+            for user_id, sid in pairs:
+                await service.connect(user_id, sid)
+
+        asyncio.run(connect_all())
+        return service
+    return build
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        pairs = synthetic_sessions(size)
+        users = len({user_id for user_id, _ in pairs})
+        print(f"{size} sessions, {users} users")
+        for name, build in (
+            ("set registry (old)", build_registry(SetRegistry, pairs)),
+            ("slotted registry", build_registry(ConnectionService, pairs)),
+        ):
+            registry, used = measure(build)
+            unregister, register, lookup = time_ops(registry, pairs)
+            print(
+                f"  {name:<20} {used / size:7.1f} bytes/connection | "
+                f"register {register:.2f}us unregister {unregister:.2f}us lookup {lookup:.2f}us"
+            )
+            del registry
+        _, used = measure(build_service(pairs))
+        print(f"  {'ConnectionService':<20} {used / size:7.1f} bytes/connection (with last-seen and presence state)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark: per-message transactions vs the group-commit write pipeline.
+
+Runs against throwaway SQLite files, so it never touches app.db/chat.db:
+
+    python benchmarks/bench_message_pipeline.py --messages 2000 --senders 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP_DIR = tempfile.mkdtemp(prefix="bench_pipeline_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'app.db')}"
+os.environ["CHAT_DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'chat.db')}"
+os.environ["ARCHIVE_DB_PATH"] = os.path.join(TMP_DIR, "archive.db")
+sys.path.insert(0, BACKEND_DIR)
+
+from database.session import SessionLocal, init_db  # noqa: E402
+from database.models import User  # noqa: E402
+from websocket.services import ChatService, MessageWritePipeline  # noqa: E402
+
+
+def seed(senders: int) -> int:
+    db = SessionLocal()
+    try:
+        for i in range(senders):
+            db.add(User(
+                email=f"bench{i}@example.com",
+                username=f"bench{i}",
+                first_name="Bench",
+                last_name=str(i),
+                hashed_password="x",
+            ))
+        db.commit()
+    finally:
+        db.close()
+    conversation = ChatService.create_conversation(list(range(1, senders + 1)), name="bench")
+    return conversation.id
+
+
+async def run_sequential(conversation_id: int, messages: int, senders: int) -> float:
+    """Previous behaviour: every socket event runs create_message on the loop"""
+    start = time.perf_counter()
+    for i in range(messages):
+        ChatService.create_message(conversation_id, 1 + i % senders, f"sequential {i}")
+    return time.perf_counter() - start
+
+
+async def run_pipeline(conversation_id: int, messages: int, senders: int, batch_size: int, latency_ms: float) -> float:
+    pipeline = MessageWritePipeline(max_batch_size=batch_size, max_latency_ms=latency_ms)
+    per_sender = messages // senders
+
+    async def sender(sender_id: int):
+        for i in range(per_sender):
+            await pipeline.submit(conversation_id, sender_id, f"pipeline {sender_id}-{i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(sender(s) for s in range(1, senders + 1)))
+    elapsed = time.perf_counter() - start
+    await pipeline.close()
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--senders", type=int, default=50, help="concurrent sockets sending messages")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    init_db()
+    conversation_id = seed(args.senders)
+    messages = (args.messages // args.senders) * args.senders
+
+    sequential = await run_sequential(conversation_id, messages, args.senders)
+    pipelined = await run_pipeline(conversation_id, messages, args.senders, args.batch_size, args.latency_ms)
+
+    print(f"messages: {messages}, senders: {args.senders}, batch size: {args.batch_size}, latency: {args.latency_ms}ms")
+    print(f"per-message transactions: {messages / sequential:10.1f} msg/s ({sequential:.2f}s)")
+    print(f"group-commit pipeline:    {messages / pipelined:10.1f} msg/s ({pipelined:.2f}s)")
+    print(f"speedup: {sequential / pipelined:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
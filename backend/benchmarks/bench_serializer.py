@@ -0,0 +1,104 @@
+"""Benchmark: Socket.IO JSON packets vs MessagePack packets.
+
+Encodes and decodes typical chat_message, conversation_updated and
+notification payloads with both packet classes and reports CPU time per
+packet and bytes on the wire:
+
+    python benchmarks/bench_serializer.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from socketio import packet, msgpack_packet  # noqa: E402
+
+from websocket.services import NotificationService  # noqa: E402
+from websocket.events import SocketEvents  # noqa: E402
+
+PACKET_CLASSES = {
+    "json": packet.Packet,
+    "msgpack": msgpack_packet.MsgPackPacket,
+}
+
+
+def sample_payloads() -> dict[str, list]:
+    now = datetime.utcnow().isoformat()
+    chat_message = {
+        "id": 123456,
+        "conversation_id": 4321,
+        "sender": {"id": 17, "name": "Maria Silva", "avatar": "/media/profile_17_3f2c9a1e.jpg"},
+        "content": "Oi! Chegando em 10 minutos, pode ir pedindo o café? ☕",
+        "content_type": "text",
+        "media_url": None,
+        "is_deleted": False,
+        "edited_at": None,
+        "created_at": now,
+        "read_by": [17, 23, 41],
+    }
+    conversation_updated = {
+        "conversation_id": 4321,
+        "latest_message": NotificationService.create_message_preview(chat_message),
+        "updated_at": now,
+        "unread_count": 3,
+    }
+    notification = NotificationService.create_notification(
+        event_type=SocketEvents.POST_COMMENT,
+        user_id=23,
+        actor_id=17,
+        actor_name="Maria Silva",
+        actor_avatar="/media/profile_17_3f2c9a1e.jpg",
+        message="Maria Silva comentou na sua publicação",
+        related_id=9876,
+        related_type="post",
+    )
+    return {
+        "chat_message": [SocketEvents.CHAT_MESSAGE, chat_message],
+        "conversation_updated": [SocketEvents.CONVERSATION_UPDATED, conversation_updated],
+        "notification": [SocketEvents.POST_COMMENT, notification],
+    }
+
+
+def measure(packet_class, data: list, iterations: int) -> tuple[float, float, int]:
+    encoded = packet_class(packet.EVENT, data=data).encode()
+
+    start = time.process_time()
+    for _ in range(iterations):
+        packet_class(packet.EVENT, data=data).encode()
+    encode_us = (time.process_time() - start) / iterations * 1e6
+
+    start = time.process_time()
+    for _ in range(iterations):
+        packet_class(encoded_packet=encoded)
+    decode_us = (time.process_time() - start) / iterations * 1e6
+
+    size = len(encoded.encode() if isinstance(encoded, str) else encoded)
+    return encode_us, decode_us, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'payload':<22} {'serializer':<10} {'encode µs':>10} {'decode µs':>10} {'bytes':>7}")
+    for name, data in sample_payloads().items():
+        results = {}
+        for serializer, packet_class in PACKET_CLASSES.items():
+            results[serializer] = measure(packet_class, data, args.iterations)
+            encode_us, decode_us, size = results[serializer]
+            print(f"{name:<22} {serializer:<10} {encode_us:>10.2f} {decode_us:>10.2f} {size:>7}")
+        json_total = results["json"][0] + results["json"][1]
+        msgpack_total = results["msgpack"][0] + results["msgpack"][1]
+        print(
+            f"{'':<22} msgpack uses {msgpack_total / json_total:.0%} of the JSON CPU time "
+            f"and {results['msgpack'][2] / results['json'][2]:.0%} of the bytes"
+        )
+
+
+if __name__ == "__main__":
+    main()
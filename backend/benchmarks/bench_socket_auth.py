@@ -0,0 +1,125 @@
+"""Benchmark: a reconnect storm of N sockets against one uvicorn worker.
+
+Seeds N users in throwaway SQLite files, starts the app in a subprocess and
+connects N Socket.IO clients at once, twice: a cold storm (every token is
+verified and its user loaded) and a warm storm after everyone disconnects
+(tokens served from the auth cache). Reports connect latency percentiles,
+wall time and server CPU:
+
+    python benchmarks/bench_socket_auth.py --sockets 5000
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP_DIR = tempfile.mkdtemp(prefix="bench_socket_auth_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'app.db')}"
+os.environ["CHAT_DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'chat.db')}"
+os.environ["ARCHIVE_DB_PATH"] = os.path.join(TMP_DIR, "archive.db")
+sys.path.insert(0, BACKEND_DIR)
+
+import socketio  # noqa: E402
+
+from core.security import create_access_token  # noqa: E402
+from database.session import SessionLocal, init_db  # noqa: E402
+from database.models import User  # noqa: E402
+
+
+def seed(count: int) -> list[str]:
+    init_db()
+    db = SessionLocal()
+    try:
+        db.add_all([
+            User(email=f"storm{i}@example.com", username=f"storm{i}", first_name="Storm",
+                 last_name=str(i), hashed_password="x")
+            for i in range(count)
+        ])
+        db.commit()
+    finally:
+        db.close()
+    return [create_access_token(f"storm{i}@example.com") for i in range(count)]
+
+
+def process_cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def storm(url: str, tokens: list[str], timeout: float) -> tuple[list[socketio.AsyncClient], list[float], float, int]:
+    clients = [socketio.AsyncClient(reconnection=False) for _ in tokens]
+
+    async def connect(client: socketio.AsyncClient, token: str) -> float | None:
+        start = time.perf_counter()
+        try:
+            await client.connect(url, auth={"token": token}, transports=["websocket"], wait_timeout=timeout)
+        except Exception:
+            return None
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(connect(c, t) for c, t in zip(clients, tokens)))
+    wall = time.perf_counter() - start
+    latencies = [r for r in results if r is not None]
+    return clients, latencies, wall, len(results) - len(latencies)
+
+
+async def run(url: str, server_pid: int, tokens: list[str], timeout: float):
+    for name in ("cold", "warm"):
+        cpu_before = process_cpu_seconds(server_pid)
+        clients, latencies, wall, failed = await storm(url, tokens, timeout)
+        cpu = process_cpu_seconds(server_pid) - cpu_before
+        if latencies:
+            print(
+                f"{name}: {len(latencies)} connected, {failed} failed in {wall:.2f}s | "
+                f"p50 {percentile(latencies, 50) * 1000:.0f}ms p95 {percentile(latencies, 95) * 1000:.0f}ms "
+                f"p99 {percentile(latencies, 99) * 1000:.0f}ms max {max(latencies) * 1000:.0f}ms | "
+                f"server CPU {cpu:.2f}s"
+            )
+        else:
+            print(f"{name}: all {failed} connects failed")
+        await asyncio.gather(*(c.disconnect() for c in clients if c.connected), return_exceptions=True)
+        await asyncio.sleep(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sockets", type=int, default=5000)
+    parser.add_argument("--port", type=int, default=8111)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    tokens = seed(args.sockets)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:socket_app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=os.environ.copy(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{args.port}/health", timeout=1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("server did not start")
+                time.sleep(0.2)
+        asyncio.run(run(f"http://127.0.0.1:{args.port}", server.pid, tokens, args.timeout))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Load test: chat fan-out over N Socket.IO clients against one local uvicorn worker.
+
+Seeds N users in throwaway SQLite files and splits them into conversations
+of --group-size members, starts main:socket_app in a subprocess and connects
+one client per user. For --duration seconds each client sends chat messages,
+typing indicators and read receipts at the configured per-client rates.
+Reports send-to-receive latency percentiles over every delivery, delivery
+throughput, sender acknowledgements and server CPU:
+
+    python benchmarks/loadtest_socketio.py --clients 500 --group-size 10 --send-rate 0.5
+
+Per-socket rate limits are disabled in the server unless --keep-rate-limits
+is given, so the numbers measure delivery rather than rejections. Nothing
+outside this machine is used.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP_DIR = tempfile.mkdtemp(prefix="loadtest_socketio_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'app.db')}"
+os.environ["CHAT_DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'chat.db')}"
+os.environ["ARCHIVE_DB_PATH"] = os.path.join(TMP_DIR, "archive.db")
+sys.path.insert(0, BACKEND_DIR)
+
+import socketio  # noqa: E402
+
+from core.security import create_access_token  # noqa: E402
+from database.session import SessionLocal, init_db  # noqa: E402
+from database.models import User  # noqa: E402
+from websocket.services import ChatService  # noqa: E402
+
+# Message content carries the sender's clock so receivers can measure latency
+CONTENT_PREFIX = "loadtest"
+
+
+def seed(count: int, group_size: int) -> tuple[list[str], list[int]]:
+    """Create users and conversations; returns tokens and each client's conversation id"""
+    init_db()
+    db = SessionLocal()
+    try:
+        users = [
+            User(email=f"load{i}@example.com", username=f"load{i}", first_name="Load",
+                 last_name=str(i), hashed_password="x")
+            for i in range(count)
+        ]
+        db.add_all(users)
+        db.commit()
+        user_ids = [user.id for user in users]
+    finally:
+        db.close()
+
+    conversation_of = []
+    for start in range(0, count, group_size):
+        members = user_ids[start:start + group_size]
+        if len(members) < 2:
+            # A lone trailing user joins the previous group
+            conversation_of.append(conversation_of[-1])
+            continue
+        conversation = ChatService.create_conversation(members, name=f"load{start}")
+        conversation_of.extend([conversation.id] * len(members))
+    tokens = [create_access_token(f"load{i}@example.com") for i in range(count)]
+    return tokens, conversation_of
+
+
+def process_cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def describe(values: list[float]) -> str:
+    if not values:
+        return "no samples"
+    return (
+        f"p50 {percentile(values, 50) * 1000:.1f}ms p95 {percentile(values, 95) * 1000:.1f}ms "
+        f"p99 {percentile(values, 99) * 1000:.1f}ms max {max(values) * 1000:.1f}ms"
+    )
+
+
+class LoadClient:
+    """One simulated user: sends on a schedule and records what it receives"""
+
+    def __init__(self, index: int, conversation_id: int, stats: dict, serializer: str = "default"):
+        self.index = index
+        self.conversation_id = conversation_id
+        self.stats = stats
+        self.last_message_id = None
+        self.sio = socketio.AsyncClient(reconnection=False, serializer=serializer)
+        self.sio.on("chat_message", self.on_chat_message)
+        self.sio.on("message_sent", self.on_message_sent)
+        self.sio.on("rate_limited", self.on_rate_limited)
+        self.sio.on("error", self.on_error)
+
+    def on_chat_message(self, message: dict):
+        received_at = time.perf_counter()
+        self.last_message_id = message.get("id")
+        parts = (message.get("content") or "").split(":")
+        if len(parts) != 4 or parts[0] != CONTENT_PREFIX or int(parts[1]) == self.index:
+            return
+        if self.stats["recording"]:
+            self.stats["deliveries"].append(received_at - float(parts[3]))
+
+    def on_message_sent(self, message: dict):
+        parts = (message.get("content") or "").split(":")
+        if len(parts) == 4 and self.stats["recording"]:
+            self.stats["acks"].append(time.perf_counter() - float(parts[3]))
+
+    def on_rate_limited(self, data: dict):
+        self.stats["rate_limited"] += 1
+
+    def on_error(self, data: dict):
+        self.stats["errors"] += 1
+
+    async def run(self, duration: float, send_rate: float, typing_rate: float, read_rate: float):
+        """Drive the three workloads as independent Poisson-ish streams until the deadline"""
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(
+            self._every(send_rate, deadline, self.send_message),
+            self._every(typing_rate, deadline, self.send_typing),
+            self._every(read_rate, deadline, self.send_read),
+        )
+
+    async def _every(self, rate: float, deadline: float, action):
+        if rate <= 0:
+            return
+        while True:
+            delay = random.expovariate(rate)
+            remaining = deadline - time.perf_counter()
+            if delay >= remaining:
+                await asyncio.sleep(max(remaining, 0))
+                return
+            await asyncio.sleep(delay)
+            if not self.sio.connected:
+                return
+            await action()
+
+    async def send_message(self):
+        self.stats["sequence"] += 1
+        content = f"{CONTENT_PREFIX}:{self.index}:{self.stats['sequence']}:{time.perf_counter()}"
+        await self.sio.emit("chat_message", {"conversation_id": self.conversation_id, "content": content})
+        if self.stats["recording"]:
+            self.stats["sent"] += 1
+
+    async def send_typing(self):
+        await self.sio.emit("typing", {"conversation_id": self.conversation_id, "typing": True})
+        self.stats["typing"] += 1
+
+    async def send_read(self):
+        if self.last_message_id is None:
+            return
+        await self.sio.emit("read_up_to", {"conversation_id": self.conversation_id, "message_id": self.last_message_id})
+        self.stats["reads"] += 1
+
+
+async def run(url: str, server_pid: int, tokens: list[str], conversation_of: list[int], args):
+    stats = {
+        "recording": False, "sequence": 0, "sent": 0, "typing": 0, "reads": 0,
+        "deliveries": [], "acks": [], "rate_limited": 0, "errors": 0,
+    }
+    serializer = "msgpack" if args.serializer == "msgpack" else "default"
+    clients = [LoadClient(i, conversation_of[i], stats, serializer) for i in range(len(tokens))]
+    connect_started = time.perf_counter()
+    # Connect in waves so the connect storm isn't part of what is being measured
+    for start in range(0, len(clients), args.connect_batch):
+        batch = clients[start:start + args.connect_batch]
+        await asyncio.gather(*(
+            c.sio.connect(url, auth={"token": tokens[c.index]}, transports=["websocket"], wait_timeout=60)
+            for c in batch
+        ), return_exceptions=True)
+    connected = sum(1 for c in clients if c.sio.connected)
+    print(f"connected {connected}/{len(clients)} clients in {time.perf_counter() - connect_started:.1f}s")
+
+    group_sizes = {}
+    for conversation_id in conversation_of:
+        group_sizes[conversation_id] = group_sizes.get(conversation_id, 0) + 1
+
+    if args.warmup > 0:
+        await asyncio.gather(*(c.run(args.warmup, args.send_rate, args.typing_rate, args.read_rate) for c in clients))
+        await asyncio.sleep(1)
+
+    stats["recording"] = True
+    cpu_before = process_cpu_seconds(server_pid)
+    started = time.perf_counter()
+    await asyncio.gather(*(c.run(args.duration, args.send_rate, args.typing_rate, args.read_rate) for c in clients))
+    # Let the tail of the run arrive before stopping the clock
+    await asyncio.sleep(args.drain)
+    stats["recording"] = False
+    elapsed = time.perf_counter() - started
+    cpu = process_cpu_seconds(server_pid) - cpu_before
+
+    expected = stats["sent"] * (sum(size * (size - 1) for size in group_sizes.values()) / max(len(conversation_of), 1))
+    deliveries = stats["deliveries"]
+    print(
+        f"sent {stats['sent']} messages, {stats['typing']} typing, {stats['reads']} read receipts "
+        f"in {args.duration:.0f}s ({stats['sent'] / args.duration:.1f} msg/s)"
+    )
+    print(
+        f"deliveries {len(deliveries)} of ~{expected:.0f} expected "
+        f"({len(deliveries) / elapsed:.1f}/s) | acks {len(stats['acks'])} | "
+        f"rate_limited {stats['rate_limited']} | errors {stats['errors']} | "
+        f"disconnected {connected - sum(1 for c in clients if c.sio.connected)}"
+    )
+    print(f"send->receive latency: {describe(deliveries)}")
+    print(f"send->ack latency:     {describe(stats['acks'])}")
+    print(f"server CPU {cpu:.2f}s over {elapsed:.1f}s ({cpu / elapsed * 100:.0f}% of one core)")
+
+    try:
+        request = urllib.request.Request(f"{url}/metrics/realtime", headers={"Authorization": f"Bearer {tokens[0]}"})
+        metrics = json.loads(urllib.request.urlopen(request, timeout=5).read())
+        outbound = metrics["outbound"]
+        print(
+            f"server: fan-out p95 {metrics['fanout_sessions']['p95']} sessions, "
+            f"emit p99 {metrics['emit_latency_ms']['p99']}ms, "
+            f"outbound high watermark {outbound['high_watermark']}, evicted {outbound['evicted']}"
+        )
+    except (OSError, KeyError):
+        pass
+
+    await asyncio.gather(*(c.sio.disconnect() for c in clients if c.sio.connected), return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--group-size", type=int, default=10, help="members per conversation")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before the run")
+    parser.add_argument("--drain", type=float, default=3, help="seconds to wait for late deliveries")
+    parser.add_argument("--send-rate", type=float, default=0.5, help="chat messages per client per second")
+    parser.add_argument("--typing-rate", type=float, default=0.5, help="typing events per client per second")
+    parser.add_argument("--read-rate", type=float, default=0.2, help="read receipts per client per second")
+    parser.add_argument("--connect-batch", type=int, default=200)
+    parser.add_argument("--keep-rate-limits", action="store_true")
+    parser.add_argument("--serializer", default="json", choices=["json", "msgpack"])
+    parser.add_argument("--port", type=int, default=8112)
+    args = parser.parse_args()
+
+    if args.group_size < 2 or args.clients < 2:
+        parser.error("need at least 2 clients and a group size of at least 2")
+
+    tokens, conversation_of = seed(args.clients, args.group_size)
+    env = os.environ.copy()
+    env["SOCKETIO_SERIALIZER"] = args.serializer
+    if not args.keep_rate_limits:
+        env["SOCKET_RATE_LIMITS"] = ""
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:socket_app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{args.port}/health", timeout=1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("server did not start")
+                time.sleep(0.2)
+        asyncio.run(run(f"http://127.0.0.1:{args.port}", server.pid, tokens, conversation_of, args))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Tiny in-memory RESP server for exercising the backplane without Redis.
+
+Implements only what RespBackplane uses (PING, SELECT, PUBLISH, SUBSCRIBE,
+HINCRBY, HGET, HMGET, HGETALL, HDEL, SET [EX], MGET, DEL, SADD, SREM, SMEMBERS, QUIT).
+Not meant for production:
+
+    python benchmarks/resp_server.py --port 6390
+    python benchmarks/resp_server.py --unix /tmp/backplane.sock
+"""
+import argparse
+import asyncio
+import time
+
+
+class RespServer:
+    def __init__(self):
+        self.hashes: dict[bytes, dict[bytes, int]] = {}
+        self.strings: dict[bytes, tuple[bytes, float | None]] = {}  # key -> (value, expires at)
+        self.sets: dict[bytes, set[bytes]] = {}
+        self.subscribers: dict[bytes, set[asyncio.StreamWriter]] = {}
+
+    def get_string(self, key: bytes) -> bytes | None:
+        value, expires_at = self.strings.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.strings[key]
+            return None
+        return value
+
+    @staticmethod
+    def encode(value) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, str):
+            return b"+" + value.encode() + b"\r\n"
+        if isinstance(value, bytes):
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(RespServer.encode(v) for v in value)
+        raise TypeError(value)
+
+    @staticmethod
+    async def read_command(reader: asyncio.StreamReader) -> list[bytes] | None:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        channels: set[bytes] = set()
+        try:
+            while True:
+                args = await self.read_command(reader)
+                if not args:
+                    break
+                name, args = args[0].upper(), args[1:]
+                if name == b"QUIT":
+                    writer.write(self.encode("OK"))
+                    break
+                writer.write(self.dispatch(name, args, writer, channels))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in channels:
+                self.subscribers.get(channel, set()).discard(writer)
+            writer.close()
+
+    def dispatch(self, name: bytes, args: list[bytes], writer, channels: set[bytes]) -> bytes:
+        if name == b"PING":
+            return self.encode("PONG")
+        if name == b"SELECT":
+            return self.encode("OK")
+        if name == b"SUBSCRIBE":
+            replies = []
+            for channel in args:
+                self.subscribers.setdefault(channel, set()).add(writer)
+                channels.add(channel)
+                replies.append(self.encode([b"subscribe", channel, len(channels)]))
+            return b"".join(replies)
+        if name == b"PUBLISH":
+            channel, message = args
+            receivers = self.subscribers.get(channel, set())
+            for subscriber in list(receivers):
+                subscriber.write(self.encode([b"message", channel, message]))
+            return self.encode(len(receivers))
+        if name == b"HINCRBY":
+            key, field, amount = args
+            values = self.hashes.setdefault(key, {})
+            values[field] = values.get(field, 0) + int(amount)
+            return self.encode(values[field])
+        if name == b"HGET":
+            key, field = args
+            value = self.hashes.get(key, {}).get(field)
+            return self.encode(None if value is None else str(value).encode())
+        if name == b"HMGET":
+            values = self.hashes.get(args[0], {})
+            return self.encode([
+                None if values.get(field) is None else str(values[field]).encode() for field in args[1:]
+            ])
+        if name == b"HGETALL":
+            values = self.hashes.get(args[0], {})
+            return self.encode([item for field, value in values.items() for item in (field, str(value).encode())])
+        if name == b"HDEL":
+            values = self.hashes.get(args[0], {})
+            return self.encode(sum(1 for field in args[1:] if values.pop(field, None) is not None))
+        if name == b"SET":
+            key, value, *options = args
+            expires_at = None
+            if len(options) == 2 and options[0].upper() == b"EX":
+                expires_at = time.monotonic() + int(options[1])
+            self.strings[key] = (value, expires_at)
+            return self.encode("OK")
+        if name == b"MGET":
+            return self.encode([self.get_string(key) for key in args])
+        if name == b"DEL":
+            removed = 0
+            for key in args:
+                for store in (self.strings, self.hashes, self.sets):
+                    if store.pop(key, None) is not None:
+                        removed += 1
+            return self.encode(removed)
+        if name == b"SADD":
+            members = self.sets.setdefault(args[0], set())
+            added = len(set(args[1:]) - members)
+            members.update(args[1:])
+            return self.encode(added)
+        if name == b"SREM":
+            members = self.sets.get(args[0], set())
+            removed = len(members & set(args[1:]))
+            members.difference_update(args[1:])
+            return self.encode(removed)
+        if name == b"SMEMBERS":
+            return self.encode(sorted(self.sets.get(args[0], set())))
+        return b"-ERR unknown command '" + name + b"'\r\n"
+
+
+async def serve(host: str, port: int, unix: str | None):
+    server = RespServer()
+    if unix:
+        listener = await asyncio.start_unix_server(server.handle, path=unix)
+    else:
+        listener = await asyncio.start_server(server.handle, host, port)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--unix", help="listen on a unix socket instead of TCP")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
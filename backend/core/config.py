@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from pydantic import BaseModel
+from sqlalchemy.engine import make_url
 from dotenv import load_dotenv
 
 # Load env from backend/.env
@@ -11,10 +12,98 @@ class Settings(BaseModel):
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", str(60 * 24)))
 
+    # Chat / realtime limits
+    MAX_CONVERSATION_MEMBERS: int = int(os.getenv("MAX_CONVERSATION_MEMBERS", "5000"))
+    CONVERSATION_PREVIEW_MEMBERS: int = int(os.getenv("CONVERSATION_PREVIEW_MEMBERS", "20"))
+    FANOUT_CHUNK_SIZE: int = int(os.getenv("FANOUT_CHUNK_SIZE", "200"))
+
+    # Post listings are paginated by cursor, newest first
+    POSTS_PAGE_SIZE: int = int(os.getenv("POSTS_PAGE_SIZE", "20"))
+    POSTS_MAX_PAGE_SIZE: int = int(os.getenv("POSTS_MAX_PAGE_SIZE", "100"))
+
+    # Friend timelines are materialized on write and trimmed to about this length
+    TIMELINE_MAX_LENGTH: int = int(os.getenv("TIMELINE_MAX_LENGTH", "500"))
+    TIMELINE_FANOUT_CHUNK_SIZE: int = int(os.getenv("TIMELINE_FANOUT_CHUNK_SIZE", "500"))
+    TIMELINE_TRIM_EVERY: int = int(os.getenv("TIMELINE_TRIM_EVERY", "20"))
+    TIMELINE_BACKFILL_POSTS: int = int(os.getenv("TIMELINE_BACKFILL_POSTS", "20"))
+
+    # Cold message archive
+    MESSAGE_ARCHIVE_AFTER_DAYS: int = int(os.getenv("MESSAGE_ARCHIVE_AFTER_DAYS", "180"))
+    MESSAGE_ARCHIVE_BATCH_SIZE: int = int(os.getenv("MESSAGE_ARCHIVE_BATCH_SIZE", "500"))
+
+    # Group commit for socket messages
+    MESSAGE_BATCH_MAX_SIZE: int = int(os.getenv("MESSAGE_BATCH_MAX_SIZE", "64"))
+    MESSAGE_BATCH_MAX_LATENCY_MS: float = float(os.getenv("MESSAGE_BATCH_MAX_LATENCY_MS", "5"))
+
+    # Read receipts from one user in one conversation are coalesced over this window
+    READ_RECEIPT_WINDOW_MS: float = float(os.getenv("READ_RECEIPT_WINDOW_MS", "250"))
+
+    # Verified socket tokens are cached until they expire, up to this many entries
+    AUTH_TOKEN_CACHE_MAX_SIZE: int = int(os.getenv("AUTH_TOKEN_CACHE_MAX_SIZE", "50000"))
+
+    # Token buckets for client events, "event=tokens per second/burst"; users get
+    # SOCKET_USER_RATE_MULTIPLIER times the per-session budget across their tabs
+    SOCKET_RATE_LIMITS: str = os.getenv(
+        "SOCKET_RATE_LIMITS",
+        "chat_message=5/20,typing=3/10,message_reaction=5/15,message_edit=2/10,"
+        "delete_message=2/10,message_read=20/100,mark_as_read=20/100,read_up_to=10/50",
+    )
+    SOCKET_USER_RATE_MULTIPLIER: float = float(os.getenv("SOCKET_USER_RATE_MULTIPLIER", "3"))
+
+    # Per-session outbound queues: events beyond the limit drop typing, then evict
+    OUTBOUND_QUEUE_MAX_SIZE: int = int(os.getenv("OUTBOUND_QUEUE_MAX_SIZE", "256"))
+    OUTBOUND_TRANSPORT_HIGH_WATER: int = int(os.getenv("OUTBOUND_TRANSPORT_HIGH_WATER", "32"))
+    # Sessions that connect with auth {"batch": true} get events collected over this window
+    SOCKET_BATCH_WINDOW_MS: float = float(os.getenv("SOCKET_BATCH_WINDOW_MS", "5"))
+
+    # Server-Sent Events fallback for notifications (GET /notifications/stream)
+    SSE_QUEUE_MAX_SIZE: int = int(os.getenv("SSE_QUEUE_MAX_SIZE", "100"))
+    SSE_KEEPALIVE_SECONDS: float = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+    SSE_REPLAY_LIMIT: int = int(os.getenv("SSE_REPLAY_LIMIT", "200"))
+    SSE_RETRY_MS: int = int(os.getenv("SSE_RETRY_MS", "3000"))
+
+    # Typing indicators: state expires after the TTL, repeated starts are throttled
+    TYPING_TTL_SECONDS: float = float(os.getenv("TYPING_TTL_SECONDS", "6"))
+    TYPING_THROTTLE_SECONDS: float = float(os.getenv("TYPING_THROTTLE_SECONDS", "3"))
+    TYPING_SWEEP_INTERVAL_SECONDS: float = float(os.getenv("TYPING_SWEEP_INTERVAL_SECONDS", "1"))
+    # Participant ids of recently active conversations, so typing and message fan-out skip the database
+    PARTICIPANT_CACHE_MAX_SIZE: int = int(os.getenv("PARTICIPANT_CACHE_MAX_SIZE", "10000"))
+
+    # Friend presence: changes are announced after the debounce window, in batches
+    PRESENCE_DEBOUNCE_SECONDS: float = float(os.getenv("PRESENCE_DEBOUNCE_SECONDS", "3"))
+    PRESENCE_STATUS_MAX_IDS: int = int(os.getenv("PRESENCE_STATUS_MAX_IDS", "200"))
+
+    # Presence snapshots survive restarts; restored users stay online for the grace window
+    PRESENCE_SNAPSHOT_INTERVAL_SECONDS: float = float(os.getenv("PRESENCE_SNAPSHOT_INTERVAL_SECONDS", "30"))
+    PRESENCE_RECONNECT_GRACE_SECONDS: float = float(os.getenv("PRESENCE_RECONNECT_GRACE_SECONDS", "30"))
+    PRESENCE_RESTORE_MAX_AGE_SECONDS: float = float(os.getenv("PRESENCE_RESTORE_MAX_AGE_SECONDS", "300"))
+
+    # Graceful shutdown: in-flight handlers get this long before clients are sent
+    # away, each told to reconnect after a random delay within the range
+    SHUTDOWN_DRAIN_TIMEOUT_SECONDS: float = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT_SECONDS", "10"))
+    SHUTDOWN_RECONNECT_MIN_MS: int = int(os.getenv("SHUTDOWN_RECONNECT_MIN_MS", "500"))
+    SHUTDOWN_RECONNECT_MAX_MS: int = int(os.getenv("SHUTDOWN_RECONNECT_MAX_MS", "5000"))
+
+    # Socket.IO packet serializer: "json" (default) or "msgpack"
+    SOCKETIO_SERIALIZER: str = os.getenv("SOCKETIO_SERIALIZER", "json").lower()
+
+    # Cross-worker pub/sub for socket emits and presence; empty keeps everything
+    # in-process (single worker). redis://host:port/db or unix:///path/to.sock
+    BACKPLANE_URL: str = os.getenv("BACKPLANE_URL", "")
+    # A worker that misses heartbeats this long stops counting toward presence
+    BACKPLANE_PRESENCE_TTL_SECONDS: int = int(os.getenv("BACKPLANE_PRESENCE_TTL_SECONDS", "30"))
+
     @property
     def DB_PATH(self) -> Path:
         return Path(__file__).resolve().parent.parent / "app.db"
 
+    @property
+    def ARCHIVE_DB_PATH(self) -> Path:
+        env_path = os.getenv("ARCHIVE_DB_PATH")
+        if env_path:
+            return Path(env_path)
+        return Path(__file__).resolve().parent.parent / "archive.db"
+
     @property
     def DATABASE_URL(self) -> str:
         env_db = os.getenv("DATABASE_URL")
@@ -22,4 +111,15 @@ class Settings(BaseModel):
             return env_db
         return f"sqlite:///{self.DB_PATH}"
 
+    @property
+    def CHAT_DATABASE_URL(self) -> str:
+        """Chat tables live in their own SQLite file next to the main database by default"""
+        env_db = os.getenv("CHAT_DATABASE_URL")
+        if env_db:
+            return env_db
+        main_url = make_url(self.DATABASE_URL)
+        if main_url.get_backend_name() != "sqlite" or main_url.database in (None, "", ":memory:"):
+            return self.DATABASE_URL
+        return f"sqlite:///{Path(main_url.database).parent / 'chat.db'}"
+
 settings = Settings()
@@ -0,0 +1,39 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from fastapi import Request, Response
+
+
+def compute_etag(*parts) -> str:
+    """Weak validator over the values a response is built from"""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:24]
+    return f'W/"{digest}"'
+
+
+def latest(*timestamps) -> datetime | None:
+    values = [t for t in timestamps if t is not None]
+    return max(values) if values else None
+
+
+def not_modified(request: Request, response: Response, etag: str, last_modified: datetime = None) -> Response | None:
+    """Set ETag/Last-Modified on the response; returns a 304 to send instead if the client's copy is current
+
+    Only If-None-Match is answered with 304. Deleting a row doesn't move
+    Last-Modified forward, so If-Modified-Since alone could keep a client on
+    a stale list.
+    """
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    if last_modified is not None:
+        # Columns hold naive UTC datetimes
+        response.headers["Last-Modified"] = format_datetime(
+            last_modified.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True
+        )
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    opaque = etag.removeprefix("W/")
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" not in tags and not any(tag.removeprefix("W/") == opaque for tag in tags):
+        return None
+    return Response(status_code=304, headers=dict(response.headers))
@@ -0,0 +1,89 @@
+import asyncio
+import functools
+import logging
+import signal
+import threading
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+_before_shutdown: list[Callable[[], Awaitable[None]]] = []
+_shutting_down = False
+
+
+def on_before_shutdown(hook: Callable[[], Awaitable[None]]):
+    """Register a coroutine to run on SIGTERM/SIGINT while sockets are still open"""
+    _before_shutdown.append(hook)
+    return hook
+
+
+def is_shutting_down() -> bool:
+    return _shutting_down
+
+
+class InFlightTracker:
+    """Counts handlers that are still running so shutdown can wait for them"""
+
+    def __init__(self):
+        self.count = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def track(self, handler):
+        """Decorator counting a coroutine handler while it runs"""
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            self.count += 1
+            self._idle.clear()
+            try:
+                return await handler(*args, **kwargs)
+            finally:
+                self.count -= 1
+                if self.count == 0:
+                    self._idle.set()
+
+        return wrapper
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Wait until nothing is in flight; returns False if the timeout hit first"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), max(timeout, 0))
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+def install_signal_hooks():
+    """Run the before-shutdown hooks first, then hand the signal to the server
+
+    uvicorn closes every connection before the lifespan shutdown event, so
+    anything that needs the live sockets has to run from the signal instead.
+    Must be called from the running event loop in the main thread.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            global _shutting_down
+            if _shutting_down:
+                # A second signal skips the hooks
+                previous(signum, frame)
+                return
+            _shutting_down = True
+            loop.call_soon_threadsafe(lambda: loop.create_task(_run_hooks(previous, signum, frame)))
+
+        signal.signal(sig, handler)
+
+
+async def _run_hooks(previous, signum, frame):
+    for hook in _before_shutdown:
+        try:
+            await hook()
+        except Exception as e:
+            logger.warning(f"Before-shutdown hook {hook.__name__} failed: {e}")
+    previous(signum, frame)
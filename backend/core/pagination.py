@@ -0,0 +1,44 @@
+import base64
+from datetime import datetime
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+
+# Response header carrying the cursor of the next page; absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def keyset_page(query, created_column, id_column, cursor: str | None, limit: int, response: Response = None) -> list:
+    """One page of a newest-first listing, ordered by (created_at, id)
+
+    The cursor holds the (created_at, id) of the last row of the previous
+    page, so each page is a range scan on the created_at index instead of
+    an OFFSET over everything before it. Sets NEXT_CURSOR_HEADER on the
+    response when there are more rows.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # The plain <= bound is what lets the created_at index drive the scan
+        query = query.filter(
+            created_column <= created_at,
+            or_(created_column < created_at, and_(created_column == created_at, id_column < row_id)),
+        )
+    rows = query.order_by(created_column.desc(), id_column.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+    if response is not None and len(rows) > limit:
+        last = page[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(last, created_column.key), getattr(last, id_column.key))
+    return page
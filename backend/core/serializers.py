@@ -0,0 +1,58 @@
+from sqlalchemy.orm import Session
+from database.models import Post, Story, User
+from schemas.post import PostOut
+from schemas.story import StoryOut
+
+# Author fields embedded in post and story responses
+AUTHOR_COLUMNS = (User.id, User.first_name, User.last_name, User.profile_photo, User.cover_photo)
+
+
+def load_authors(db: Session, user_ids) -> dict:
+    """Author columns for a set of user ids in one query, keyed by id
+
+    Listings go through here rather than touching post.author, which
+    lazily loads a full User per row.
+    """
+    ids = set(user_ids)
+    if not ids:
+        return {}
+    return {row.id: row for row in db.query(*AUTHOR_COLUMNS).filter(User.id.in_(ids))}
+
+
+def post_out(post: Post, author) -> PostOut:
+    """author is a User or a load_authors row; None shows the post as anonymous"""
+    return PostOut(
+        id=post.id,
+        content=post.content,
+        media_url=post.media_url,
+        created_at=post.created_at,
+        user_id=post.user_id,
+        user_name=f"{author.first_name} {author.last_name}" if author else "Anônimo",
+        unique_id=post.unique_id,
+        user_profile_photo=author.profile_photo if author else None,
+        user_cover_photo=author.cover_photo if author else None,
+    )
+
+
+def story_out(story: Story, author) -> StoryOut:
+    return StoryOut(
+        id=story.id,
+        content=story.content,
+        media_url=story.media_url,
+        created_at=story.created_at,
+        user_id=story.user_id,
+        user_name=f"{author.first_name} {author.last_name}" if author else "Anônimo",
+        user_profile_photo=author.profile_photo if author else None,
+    )
+
+
+def serialize_posts(db: Session, posts, authors: dict = None) -> list[PostOut]:
+    """PostOut for each post, in order; pass authors when they are already known"""
+    if authors is None:
+        authors = load_authors(db, (p.user_id for p in posts))
+    return [post_out(p, authors.get(p.user_id)) for p in posts]
+
+
+def serialize_stories(db: Session, stories) -> list[StoryOut]:
+    authors = load_authors(db, (s.user_id for s in stories))
+    return [story_out(s, authors.get(s.user_id)) for s in stories]
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+from datetime import datetime
+from sqlalchemy import and_, or_
+from sqlalchemy.dialects.sqlite import insert
+from core.config import settings
+from database.session import SessionLocal
+from database.models import Friendship, Post, TimelineEntry
+
+logger = logging.getLogger(__name__)
+
+class TimelineFanout:
+    """Materializes posts into friend timelines when they are written
+
+    Creating a post only queues it. A background worker copies it, in
+    chunks and off the event loop, into the timeline of the author and of
+    every friend, so reading a timeline is one range scan on
+    ix_timeline_owner_created however many friends the reader has.
+
+    Timelines are kept to about TIMELINE_MAX_LENGTH entries. Finding the
+    cut-off costs a walk over the whole timeline, so an owner is only
+    trimmed on roughly one fan-out in TIMELINE_TRIM_EVERY.
+
+    Friendships and posts from before timelines existed are copied in by
+    backfill_existing, queued at startup while the table is empty; it can
+    also be run by hand with python -m core.timeline.
+    """
+
+    def __init__(self, max_length: int = None, chunk_size: int = None, trim_every: int = None):
+        self.max_length = max_length or settings.TIMELINE_MAX_LENGTH
+        self.chunk_size = chunk_size or settings.TIMELINE_FANOUT_CHUNK_SIZE
+        self.trim_every = trim_every or settings.TIMELINE_TRIM_EVERY
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self.stats = {"posts": 0, "entries": 0, "trimmed": 0, "failed": 0}
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._worker = self._loop.create_task(self._run())
+        self._submit(self._backfill_if_empty)
+
+    def _submit(self, job, *args):
+        """Queue a job from any thread; without a running worker (scripts) it runs inline"""
+        if self._worker is None or self._worker.done():
+            job(*args)
+            return
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (job, args))
+
+    def post_created(self, post: Post):
+        self._submit(self.fan_out, post.id, post.user_id, post.created_at)
+
+    def friendship_created(self, user_id: int, friend_id: int):
+        """Give both new friends each other's recent posts"""
+        self._submit(self.backfill, user_id, friend_id)
+        self._submit(self.backfill, friend_id, user_id)
+
+    async def _run(self):
+        while True:
+            job, args = await self._queue.get()
+            try:
+                await asyncio.to_thread(job, *args)
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.warning(f"Timeline job {job.__name__}{args} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def fan_out(self, post_id: int, author_id: int, created_at: datetime) -> int:
+        """Insert a post into the author's and every friend's timeline; returns the number of timelines"""
+        db = SessionLocal()
+        try:
+            friend_ids = [friend_id for (friend_id,) in db.query(Friendship.friend_id).filter(Friendship.user_id == author_id)]
+            owners = [author_id] + friend_ids
+            # One transaction per chunk keeps the writer lock short for authors with many friends
+            for start in range(0, len(owners), self.chunk_size):
+                chunk = owners[start:start + self.chunk_size]
+                db.execute(insert(TimelineEntry).values([
+                    {"owner_id": owner_id, "post_id": post_id, "author_id": author_id, "created_at": created_at}
+                    for owner_id in chunk
+                ]).on_conflict_do_nothing())
+                # Checked after the insert holds the write lock: a delete_post that committed first
+                # means the post is gone, one that commits later also removes these rows
+                if db.query(Post.id).filter(Post.id == post_id).first() is None:
+                    db.rollback()
+                    return 0
+                for owner_id in chunk:
+                    if (owner_id + post_id) % self.trim_every == 0:
+                        self.stats["trimmed"] += self._trim(db, owner_id)
+                db.commit()
+            self.stats["posts"] += 1
+            self.stats["entries"] += len(owners)
+            return len(owners)
+        finally:
+            db.close()
+
+    def backfill(self, owner_id: int, author_id: int) -> int:
+        """Copy an author's most recent posts into one timeline"""
+        db = SessionLocal()
+        try:
+            posts = (
+                db.query(Post.id, Post.created_at)
+                .filter(Post.user_id == author_id)
+                .order_by(Post.created_at.desc(), Post.id.desc())
+                .limit(settings.TIMELINE_BACKFILL_POSTS)
+                .all()
+            )
+            if not posts:
+                return 0
+            post_ids = [post_id for post_id, _ in posts]
+            db.execute(insert(TimelineEntry).values([
+                {"owner_id": owner_id, "post_id": post_id, "author_id": author_id, "created_at": created_at}
+                for post_id, created_at in posts
+            ]).on_conflict_do_nothing())
+            # Same as in fan_out: drop posts deleted since they were read
+            remaining = {post_id for (post_id,) in db.query(Post.id).filter(Post.id.in_(post_ids))}
+            deleted = [post_id for post_id in post_ids if post_id not in remaining]
+            if deleted:
+                db.query(TimelineEntry).filter(
+                    TimelineEntry.owner_id == owner_id, TimelineEntry.post_id.in_(deleted),
+                ).delete(synchronize_session=False)
+            self.stats["trimmed"] += self._trim(db, owner_id)
+            db.commit()
+            self.stats["entries"] += len(posts)
+            return len(posts)
+        finally:
+            db.close()
+
+    def backfill_existing(self) -> int:
+        """Fill every timeline from the posts of its owner and their current friends
+
+        Safe to run again: entries already present are skipped. Returns the
+        number of timelines written to.
+        """
+        db = SessionLocal()
+        try:
+            authors = [user_id for (user_id,) in db.query(Post.user_id).distinct()]
+            friendships = db.query(Friendship.user_id, Friendship.friend_id).filter(
+                Friendship.friend_id.in_(authors)
+            ).all()
+        finally:
+            db.close()
+        pairs = [(author_id, author_id) for author_id in authors] + friendships
+        for owner_id, author_id in pairs:
+            self.backfill(owner_id, author_id)
+        return len({owner_id for owner_id, _ in pairs})
+
+    def _backfill_if_empty(self):
+        db = SessionLocal()
+        try:
+            empty = db.query(TimelineEntry.id).first() is None and db.query(Post.id).first() is not None
+        finally:
+            db.close()
+        if empty:
+            logger.info(f"Backfilled {self.backfill_existing()} timelines from existing posts and friendships")
+
+    def _trim(self, db, owner_id: int) -> int:
+        """Delete what lies beyond the newest max_length entries of a timeline"""
+        cutoff = (
+            db.query(TimelineEntry.created_at, TimelineEntry.post_id)
+            .filter(TimelineEntry.owner_id == owner_id)
+            .order_by(TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc())
+            .offset(self.max_length)
+            .first()
+        )
+        if cutoff is None:
+            return 0
+        created_at, post_id = cutoff
+        return db.query(TimelineEntry).filter(
+            TimelineEntry.owner_id == owner_id,
+            TimelineEntry.created_at <= created_at,
+            or_(TimelineEntry.created_at < created_at, and_(TimelineEntry.created_at == created_at, TimelineEntry.post_id <= post_id)),
+        ).delete(synchronize_session=False)
+
+    async def close(self, timeout: float = 5):
+        """Finish queued fan-outs (up to the timeout), then stop the worker"""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping timeline worker with {self._queue.qsize()} jobs queued")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    def get_metrics(self) -> dict:
+        return {"queued": self._queue.qsize() if self._queue is not None else 0, **self.stats}
+
+
+# Global timeline fan-out worker
+timeline_fanout = TimelineFanout()
+
+
+if __name__ == "__main__":
+    from database.session import init_db
+    init_db()
+    print(f"Backfilled {timeline_fanout.backfill_existing()} timelines")
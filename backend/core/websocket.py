@@ -1,23 +1,168 @@
+import asyncio
+import functools
+import random
+from socketio.exceptions import ConnectionRefusedError
 from websocket.handlers import AuthHandler, ChatHandler, NotificationHandler
-from websocket.services import ConnectionService
+from websocket.services import (
+    ConnectionService, FanoutService, NotificationService, NotificationStreams, PresenceService,
+    PresenceSnapshotService, RateLimiter, create_backplane, realtime_metrics,
+)
+from websocket.events import SocketEvents
 from websocket import sio
 from database.models import User, Message
+from core.config import settings
+from core.lifecycle import InFlightTracker, install_signal_hooks, is_shutting_down, on_before_shutdown
 
 # Initialize connection service
-connection_service = ConnectionService()
+backplane = create_backplane(settings.BACKPLANE_URL)
+connection_service = ConnectionService(backplane)
+notification_streams = NotificationStreams()
+fanout_service = FanoutService(sio, connection_service, streams=notification_streams)
+presence_service = PresenceService(connection_service, fanout_service)
+presence_snapshot = PresenceSnapshotService(connection_service, presence_service)
+rate_limiter = RateLimiter()
+inflight = InFlightTracker()
 
 # Initialize handlers
 auth_handler = AuthHandler()
-chat_handler = ChatHandler(sio, connection_service)
-notification_handler = NotificationHandler(sio, connection_service)
+chat_handler = ChatHandler(sio, connection_service, fanout_service)
+notification_handler = NotificationHandler(sio, connection_service, fanout_service)
+
+
+async def start_realtime():
+    """Subscribe to emits published by other workers and start background sweepers"""
+    await backplane.start(handle_backplane_message, on_presence_lost=handle_presence_lost)
+    chat_handler.start_typing_sweeper()
+    presence_snapshot.start()
+    install_signal_hooks()
+
+
+@on_before_shutdown
+async def drain_connections():
+    """Let in-flight events finish, persist state, then send clients away with spread-out reconnect hints
+
+    Runs from SIGTERM/SIGINT while sockets are still open; new connections are
+    refused and new events rejected from the moment the signal arrives.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.SHUTDOWN_DRAIN_TIMEOUT_SECONDS
+    if not await inflight.wait_idle(deadline - loop.time()):
+        print(f"[shutdown] {inflight.count} handlers still running at the drain deadline")
+    await chat_handler.read_receipts.close()
+    await presence_snapshot.close(final_snapshot=True)
+    # SSE clients resume from Last-Event-ID on the next process
+    notification_streams.close_all()
+
+    # Each client gets its own delay so the next process isn't hit by every reconnect at once
+    sids = list(connection_service.sessions)
+    for sid in sids:
+        await fanout_service.emit_to_session(SocketEvents.SERVER_RESTARTING, {
+            "reconnect_after_ms": random.randint(settings.SHUTDOWN_RECONNECT_MIN_MS, settings.SHUTDOWN_RECONNECT_MAX_MS),
+        }, sid)
+    # Acknowledgements and hints are queued; hand them to the transport before disconnecting
+    await fanout_service.outbound.wait_empty(max(deadline - loop.time(), 1))
+    await asyncio.gather(*(sio.disconnect(sid) for sid in sids), return_exceptions=True)
+    print(f"[shutdown] Drained {len(sids)} sessions")
+
+
+def track_inflight(handler):
+    """Count a socket event handler as in flight; once draining, new events are rejected"""
+    tracked = inflight.track(handler)
+
+    @functools.wraps(handler)
+    async def wrapper(sid, data=None):
+        if is_shutting_down():
+            await fanout_service.emit_to_session('error', {
+                'message': 'Server is restarting',
+                'event': handler.__name__,
+                'retry': True,
+            }, sid)
+            return
+        return await tracked(sid, data)
+
+    return wrapper
+
+
+async def stop_realtime():
+    """Stop background tasks, flush pending writes and leave the backplane"""
+    await chat_handler.stop_typing_sweeper()
+    await presence_snapshot.close()
+    await chat_handler.read_receipts.close()
+    await presence_service.close()
+    await chat_handler.message_pipeline.close()
+    await backplane.close()
+
+
+async def handle_backplane_message(message: dict):
+    """Apply a message published by another worker"""
+    if message.get("type") == "user_card":
+        auth_handler.invalidate_user(message["card"]["id"])
+        await store_user_card(message["card"])
+    else:
+        await fanout_service.handle_remote(message)
+
+
+def handle_presence_lost(user_ids: list[int]):
+    """Announce users whose last sessions were on a worker that died"""
+    for user_id in user_ids:
+        presence_service.mark_changed(user_id, False)
+
+
+async def get_user_card(sid) -> dict | None:
+    """Get the user card cached on a socket session at connect time"""
+    try:
+        session = await sio.get_session(sid)
+    except KeyError:
+        return None
+    return session.get("user")
+
+
+async def store_user_card(card: dict):
+    """Replace the cached card on every local session of a user"""
+    for sid in list(connection_service.get_user_sessions(card["id"])):
+        try:
+            session = await sio.get_session(sid)
+        except KeyError:
+            continue
+        session["user"] = card
+        await sio.save_session(sid, session)
+
+
+def rate_limited(handler):
+    """Reject events beyond the session's or user's budget before the handler runs"""
+    event = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(sid, data=None):
+        user_id = connection_service.get_user_id(sid)
+        if not rate_limiter.allow(sid, user_id, event):
+            if rate_limiter.should_notify(sid, event):
+                await fanout_service.emit_to_session(SocketEvents.RATE_LIMITED, {
+                    "event": event,
+                    "retry_after": rate_limiter.retry_after(event),
+                }, sid)
+            return
+        return await handler(sid, data)
+
+    return wrapper
 
 
 @sio.event
+@realtime_metrics.instrument
 async def connect(sid, environ, auth):
     """Handle new socket connection"""
+    if is_shutting_down():
+        raise ConnectionRefusedError("server_restarting")
     try:
         user = await auth_handler.authenticate_socket(auth)
-        await connection_service.connect(user.id, sid)
+        # Events read the sender's name/avatar from here instead of re-querying users
+        await sio.save_session(sid, {"user": NotificationService.create_user_card(user)})
+        if auth.get("batch"):
+            fanout_service.outbound.enable_batching(sid)
+        came_online = await connection_service.connect(user.id, sid)
+        await sio.enter_room(sid, connection_service.user_room(user.id))
+        if came_online:
+            presence_service.mark_changed(user.id, True)
         print(f"User {user.id} connected with sid {sid}")
     except Exception as e:
         print(f"Connection error: {e}")
@@ -25,31 +170,36 @@ async def connect(sid, environ, auth):
 
 
 @sio.event
+@realtime_metrics.instrument
 async def disconnect(sid):
     """Handle socket disconnection"""
-    await connection_service.disconnect(sid)
+    user_id = connection_service.get_user_id(sid)
+    went_offline = await connection_service.disconnect(sid)
+    fanout_service.outbound.discard(sid)
+    rate_limiter.discard_session(sid)
+    # A drain disconnect is a reconnect in progress, not the user going offline
+    if went_offline and not is_shutting_down():
+        presence_service.mark_changed(user_id, False)
+    if user_id and not connection_service.is_user_online(user_id):
+        rate_limiter.release_user(user_id)
+        await chat_handler.stop_user_typing(user_id)
     print(f"Client {sid} disconnected")
 
 
 # ============= CHAT EVENTS =============
 
 @sio.event
+@realtime_metrics.instrument
+@track_inflight
+@rate_limited
 async def chat_message(sid, data):
     """Handle incoming chat message"""
     try:
-        user_id = connection_service.user_by_session.get(sid)
-        if not user_id:
-            print(f"[chat_message] No user_id for sid {sid}")
-            return
-
-        from database.session import SessionLocal
-        db = SessionLocal()
-        user = db.query(User).filter(User.id == user_id).first()
-        db.close()
-
+        user = await get_user_card(sid)
         if not user:
-            print(f"[chat_message] User {user_id} not found")
+            print(f"[chat_message] No user for sid {sid}")
             return
+        user_id = user["id"]
 
         conversation_id = data.get("conversation_id")
         content = data.get("content")
@@ -59,7 +209,7 @@ async def chat_message(sid, data):
         print(f"[chat_message] User {user_id} sending message to conversation {conversation_id}")
 
         message_payload = await chat_handler.handle_send_message(
-            user=user,
+            sender=user,
             conversation_id=conversation_id,
             content=content,
             content_type=content_type,
@@ -68,58 +218,81 @@ async def chat_message(sid, data):
 
         print(f"[chat_message] Message created: {message_payload}")
 
+        # Sending ends the sender's typing indicator
+        if user_id in connection_service.get_typing_users(conversation_id):
+            connection_service.stop_typing(conversation_id, user_id)
+            await chat_handler.emit_typing(conversation_id, user_id, user["name"], False)
+
         # Emit to all participants in the conversation
-        conversation = chat_handler.chat_service.get_conversation(conversation_id)
-        if conversation:
-            for participant in conversation.participants:
-                sessions = connection_service.get_user_sessions(participant.id)
-                for session_id in sessions:
-                    await sio.emit('chat_message', message_payload, to=session_id)
-            print(f"[chat_message] Emitted to {len(conversation.participants)} participants")
-        else:
-            print(f"[chat_message] Conversation {conversation_id} not found")
+        delivered = await chat_handler.emit_to_conversation(conversation_id, 'chat_message', message_payload)
+        print(f"[chat_message] Emitted to {delivered} sessions")
+
+        # Push the new inbox summary so clients don't need to re-poll conversations
+        await chat_handler.emit_conversation_updated(
+            conversation_id,
+            {
+                "latest_message": chat_handler.notification_service.create_message_preview(message_payload),
+                "updated_at": message_payload["created_at"],
+            },
+            include_unread=True,
+        )
 
         # Send confirmation back to sender
-        await sio.emit('message_sent', {**message_payload, 'confirmed': True}, to=sid)
+        await fanout_service.emit_to_session('message_sent', {**message_payload, 'confirmed': True}, sid)
     except Exception as e:
         print(f"Error handling chat message: {e}")
+        realtime_metrics.record_error()
         import traceback
         traceback.print_exc()
-        await sio.emit('error', {'message': str(e)}, to=sid)
+        await fanout_service.emit_to_session('error', {'message': str(e)}, sid)
+
+
+def queue_read_receipt(sid, data) -> bool:
+    """Feed a read receipt into the per-user, per-conversation coalescer"""
+    user_id = connection_service.get_user_id(sid)
+    conversation_id = data.get("conversation_id")
+    message_id = data.get("message_id")
+    if not user_id or not conversation_id or not message_id:
+        return False
+    chat_handler.handle_read_up_to(user_id, int(conversation_id), int(message_id))
+    return True
 
 
 @sio.event
-async def message_read(sid, data):
-    """Handle message read confirmation"""
+@realtime_metrics.instrument
+@track_inflight
+@rate_limited
+async def read_up_to(sid, data):
+    """Handle "read everything up to message X" for a conversation"""
     try:
-        user_id = connection_service.user_by_session.get(sid)
-        if not user_id:
-            return
-
-        message_id = data.get("message_id")
-        conversation_id = data.get("conversation_id")
+        queue_read_receipt(sid, data)
+    except Exception as e:
+        print(f"Error handling read up to: {e}")
+        realtime_metrics.record_error()
 
-        read_data = await chat_handler.handle_message_read(message_id, user_id)
 
-        # Emit to all participants in conversation
-        conversation = chat_handler.chat_service.get_conversation(conversation_id)
-        if conversation:
-            for participant in conversation.participants:
-                sessions = connection_service.get_user_sessions(participant.id)
-                for session_id in sessions:
-                    if session_id != sid:
-                        await sio.emit('message_read', read_data, to=session_id)
-
-        await sio.emit('message_read_confirmed', read_data, to=sid)
+@sio.event
+@realtime_metrics.instrument
+@track_inflight
+@rate_limited
+async def message_read(sid, data):
+    """Handle message read confirmation"""
+    try:
+        # Per-message receipts are coalesced into a single read_up_to write and broadcast
+        queue_read_receipt(sid, data)
     except Exception as e:
         print(f"Error handling message read: {e}")
+        realtime_metrics.record_error()
 
 
 @sio.event
+@realtime_metrics.instrument
+@track_inflight
+@rate_limited
 async def delete_message(sid, data):
     """Handle message deletion"""
     try:
-        user_id = connection_service.user_by_session.get(sid)
+        user_id = connection_service.get_user_id(sid)
         if not user_id:
             return
 
@@ -129,30 +302,29 @@ async def delete_message(sid, data):
         db.close()
 
         if not message or message.sender_id != user_id:
-            await sio.emit('error', {'message': 'Not authorized'}, to=sid)
+            await fanout_service.emit_to_session('error', {'message': 'Not authorized'}, sid)
             return
 
         delete_data = await chat_handler.handle_delete_message(data.get("message_id"))
 
         # Emit to all participants in conversation
-        conversation = chat_handler.chat_service.get_conversation(delete_data['conversation_id'])
-        if conversation:
-            for participant in conversation.participants:
-                sessions = connection_service.get_user_sessions(participant.id)
-                for session_id in sessions:
-                    await sio.emit('message_deleted', delete_data, to=session_id)
-
-        await sio.emit('message_deleted_confirmed', delete_data, to=sid)
+        await chat_handler.emit_to_conversation(delete_data['conversation_id'], 'message_deleted', delete_data)
+
+        await fanout_service.emit_to_session('message_deleted_confirmed', delete_data, sid)
     except Exception as e:
         print(f"Error handling message delete: {e}")
-        await sio.emit('error', {'message': str(e)}, to=sid)
+        realtime_metrics.record_error()
+        await fanout_service.emit_to_session('error', {'message': str(e)}, sid)
 
 
 @sio.event
+@realtime_metrics.instrument
+@track_inflight
+@rate_limited
 async def message_edit(sid, data):
     """Handle message editing"""
     try:
-        user_id = connection_service.user_by_session.get(sid)
+        user_id = connection_service.get_user_id(sid)
         if not user_id:
             return
 
@@ -162,7 +334,7 @@ async def message_edit(sid, data):
         db.close()
 
         if not message or message.sender_id != user_id:
-            await sio.emit('error', {'message': 'Not authorized'}, to=sid)
+            await fanout_service.emit_to_session('error', {'message': 'Not authorized'}, sid)
             return
 
         edit_data = await chat_handler.handle_edit_message(
@@ -171,24 +343,23 @@ async def message_edit(sid, data):
         )
 
         # Emit to all participants in conversation
-        conversation = chat_handler.chat_service.get_conversation(edit_data['conversation_id'])
-        if conversation:
-            for participant in conversation.participants:
-                sessions = connection_service.get_user_sessions(participant.id)
-                for session_id in sessions:
-                    await sio.emit('message_edited', edit_data, to=session_id)
-
-        await sio.emit('message_edited_confirmed', edit_data, to=sid)
+        await chat_handler.emit_to_conversation(edit_data['conversation_id'], 'message_edited', edit_data)
+
+        await fanout_service.emit_to_session('message_edited_confirmed', edit_data, sid)
     except Exception as e:
         print(f"Error handling message edit: {e}")
-        await sio.emit('error', {'message': str(e)}, to=sid)
+        realtime_metrics.record_error()
+        await fanout_service.emit_to_session('error', {'message': str(e)}, sid)
 
 
 @sio.event
+@realtime_metrics.instrument
+@track_inflight
+@rate_limited
 async def message_reaction(sid, data):
     """Handle message reaction"""
     try:
-        user_id = connection_service.user_by_session.get(sid)
+        user_id = connection_service.get_user_id(sid)
         if not user_id:
             return
 
@@ -208,80 +379,126 @@ async def message_reaction(sid, data):
         }
 
         # Emit reaction to all participants in the conversation (including sender)
-        conversation = chat_handler.chat_service.get_conversation(message.conversation_id)
-        if conversation:
-            for participant in conversation.participants:
-                sessions = connection_service.get_user_sessions(participant.id)
-                for session_id in sessions:
-                    await sio.emit('message_reaction', reaction_data, to=session_id)
+        await chat_handler.emit_to_conversation(message.conversation_id, 'message_reaction', reaction_data)
     except Exception as e:
         print(f"Error handling message reaction: {e}")
+        realtime_metrics.record_error()
 
 
 @sio.event
+@realtime_metrics.instrument
+@track_inflight
+@rate_limited
 async def mark_as_read(sid, data):
     """Handle marking message as read"""
     try:
-        user_id = connection_service.user_by_session.get(sid)
-        if not user_id:
-            return
-
-        message_id = data.get("message_id")
-        conversation_id = data.get("conversation_id")
-
-        read_data = await chat_handler.handle_message_read(message_id, user_id)
-
-        # Emit to all participants in conversation
-        conversation = chat_handler.chat_service.get_conversation(conversation_id)
-        if conversation:
-            for participant in conversation.participants:
-                sessions = connection_service.get_user_sessions(participant.id)
-                for session_id in sessions:
-                    await sio.emit('message_read', read_data, to=session_id)
-
-        await sio.emit('message_read_confirmed', read_data, to=sid)
+        queue_read_receipt(sid, data)
     except Exception as e:
         print(f"Error handling mark as read: {e}")
+        realtime_metrics.record_error()
 
 
 @sio.event
+@realtime_metrics.instrument
+@track_inflight
+@rate_limited
 async def typing(sid, data):
     """Handle typing indicator"""
     try:
-        user_id = connection_service.user_by_session.get(sid)
-        if not user_id:
+        user = await get_user_card(sid)
+        if not user:
             return
 
-        from database.session import SessionLocal
-        db = SessionLocal()
-        user = db.query(User).filter(User.id == user_id).first()
-        db.close()
+        # Repeated keystrokes only refresh the TTL; the throttle decides what is broadcast
+        await chat_handler.handle_typing(
+            user=user,
+            conversation_id=data.get("conversation_id"),
+            is_typing=data.get("typing", True),
+        )
+    except Exception as e:
+        print(f"Error handling typing: {e}")
+        realtime_metrics.record_error()
 
-        if not user:
-            return
 
-        conversation_id = data.get("conversation_id")
-        is_typing = data.get("typing", True)
+# ============= CONVERSATION EVENTS =============
 
-        # Create typing payload
-        typing_payload = {
-            "user_id": user_id,
-            "user_name": f"{user.first_name} {user.last_name}".strip(),
-            "conversation_id": conversation_id,
-            "typing": is_typing,
-        }
+async def emit_conversation_updated(conversation_id: int, fields: dict, include_unread: bool = False, user_ids: list[int] = None):
+    """Emit a compact inbox update (only the changed fields) for a conversation"""
+    await chat_handler.emit_conversation_updated(
+        conversation_id=conversation_id,
+        fields=fields,
+        include_unread=include_unread,
+        user_ids=user_ids,
+    )
 
-        # Emit to all participants except sender
-        conversation = chat_handler.chat_service.get_conversation(conversation_id)
-        if conversation:
-            for participant in conversation.participants:
-                if participant.id != user_id:  # Don't send to the typing user
-                    sessions = connection_service.get_user_sessions(participant.id)
-                    for session_id in sessions:
-                        event_name = 'typing_start' if is_typing else 'typing_stop'
-                        await sio.emit(event_name, typing_payload, to=session_id)
-    except Exception as e:
-        print(f"Error handling typing: {e}")
+
+# ============= USER SESSION EVENTS =============
+
+async def refresh_user_card(user: User):
+    """Refresh the cached card on the user's sockets after a name or photo change"""
+    card = NotificationService.create_user_card(user)
+    auth_handler.invalidate_user(user.id)
+    await store_user_card(card)
+    if backplane.distributed:
+        await backplane.publish({"type": "user_card", "card": card})
+
+
+# ============= METRICS =============
+
+def get_realtime_metrics() -> dict:
+    """Snapshot of socket-layer counters and queue depths"""
+    return {
+        "connections": {
+            **connection_service.get_connection_counts(),
+            "typing_conversations": len(connection_service.typing_users),
+            "inflight_handlers": inflight.count,
+        },
+        **realtime_metrics.snapshot(),
+        "notification_streams": notification_streams.get_metrics(),
+        "outbound": fanout_service.outbound.get_metrics(),
+        "typing": dict(connection_service.typing_stats),
+        "rate_limited": dict(rate_limiter.rejected),
+        "auth_cache": {
+            "hits": auth_handler.hits,
+            "misses": auth_handler.misses,
+        },
+        "read_receipts": {
+            "received": chat_handler.read_receipts.received,
+            "flushed": chat_handler.read_receipts.flushed,
+        },
+    }
+
+
+# ============= PRESENCE =============
+
+async def get_online_status(user_ids: list[int]) -> dict[int, bool]:
+    """Get whether each user is connected to any worker"""
+    online = await connection_service.get_online_user_ids(user_ids)
+    return {uid: uid in online for uid in user_ids}
+
+
+def get_last_seen(user_ids: list[int]) -> dict:
+    """Last seen times, from memory when this worker saw the user, else from the snapshot table"""
+    last_seen = {uid: connection_service.last_seen[uid] for uid in user_ids if uid in connection_service.last_seen}
+    missing = [uid for uid in user_ids if uid not in last_seen]
+    last_seen.update(presence_snapshot.get_last_seen(missing))
+    return last_seen
+
+
+# ============= NOTIFICATION STREAM (SSE) =============
+
+async def authenticate_token(token: str) -> User:
+    """Resolve a bearer token to its user through the socket auth cache"""
+    return await auth_handler.authenticate_socket({"token": token})
+
+
+def subscribe_notifications(user_id: int):
+    """Open a queue receiving the user's notification events, as (event, payload) or CLOSE_STREAM"""
+    return notification_streams.subscribe(user_id)
+
+
+def unsubscribe_notifications(user_id: int, queue):
+    notification_streams.unsubscribe(user_id, queue)
 
 
 # ============= PROFILE VISIT EVENTS =============
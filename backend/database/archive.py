@@ -0,0 +1,113 @@
+"""Cold archive job for chat messages.
+
+Moves messages older than MESSAGE_ARCHIVE_AFTER_DAYS (and their read receipts)
+from the hot ``messages`` table into the attached archive database. The newest
+message of every conversation always stays hot so inbox previews keep working.
+
+SQLite doesn't commit atomically across attached databases in WAL mode, so each
+batch is copied into the archive in one transaction (INSERT OR IGNORE) and
+deleted from the hot tables in a second one, only where the copy is present. A
+crash in between leaves the batch in both places; the next run copies nothing
+new and finishes the delete.
+
+Run it periodically (e.g. from cron) from the backend directory:
+
+    python -m database.archive
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, func, and_, exists
+from core.config import settings
+from database.session import ChatSessionLocal, init_db
+from database.models import Message, message_reads, ArchivedMessage, archived_message_reads
+
+MESSAGE_COLUMNS = [
+    "id", "conversation_id", "sender_id", "content", "content_type",
+    "media_url", "is_deleted", "edited_at", "created_at",
+]
+
+
+def archive_old_messages(older_than_days: int = None, batch_size: int = None) -> int:
+    """Move cold messages into the archive database, returning how many were moved"""
+    older_than_days = older_than_days if older_than_days is not None else settings.MESSAGE_ARCHIVE_AFTER_DAYS
+    batch_size = batch_size or settings.MESSAGE_ARCHIVE_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    latest_per_conversation = select(func.max(Message.id)).group_by(Message.conversation_id)
+    hot_table = Message.__table__
+    archive_table = ArchivedMessage.__table__
+
+    moved = 0
+    while True:
+        db = ChatSessionLocal()
+        try:
+            ids = db.execute(
+                select(Message.id).where(
+                    and_(
+                        Message.created_at < cutoff,
+                        Message.id.notin_(latest_per_conversation),
+                    )
+                ).order_by(Message.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+
+            # Transaction 1 writes only the archive database
+            db.execute(
+                insert(archive_table).prefix_with("OR IGNORE").from_select(
+                    MESSAGE_COLUMNS,
+                    select(*[hot_table.c[name] for name in MESSAGE_COLUMNS]).where(hot_table.c.id.in_(ids)),
+                )
+            )
+            db.execute(
+                insert(archived_message_reads).prefix_with("OR IGNORE").from_select(
+                    ["message_id", "user_id", "read_at"],
+                    select(
+                        message_reads.c.message_id,
+                        message_reads.c.user_id,
+                        message_reads.c.read_at,
+                    ).where(message_reads.c.message_id.in_(ids)),
+                )
+            )
+            db.commit()
+
+            # Transaction 2 writes only the hot database, and only rows whose copy is in the
+            # archive. A message that got a read receipt after the copy waits for the next run.
+            # Both read tables are called message_reads, so they need their own names here
+            hot_reads = message_reads.alias("hot_reads")
+            cold_reads = archived_message_reads.alias("cold_reads")
+            uncopied_read = exists().where(
+                hot_reads.c.message_id == hot_table.c.id,
+                ~exists().where(
+                    cold_reads.c.message_id == hot_reads.c.message_id,
+                    cold_reads.c.user_id == hot_reads.c.user_id,
+                ),
+            )
+            archived_ids = db.execute(
+                select(hot_table.c.id).where(
+                    hot_table.c.id.in_(ids),
+                    hot_table.c.id.in_(select(archive_table.c.id)),
+                    ~uncopied_read,
+                )
+            ).scalars().all()
+            if archived_ids:
+                db.execute(delete(message_reads).where(message_reads.c.message_id.in_(archived_ids)))
+                db.execute(delete(hot_table).where(hot_table.c.id.in_(archived_ids)))
+                db.commit()
+            moved += len(archived_ids)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        # Also stops if a whole batch was held back, instead of selecting it forever
+        if len(ids) < batch_size or not archived_ids:
+            break
+
+    return moved
+
+
+if __name__ == "__main__":
+    init_db()
+    count = archive_old_messages()
+    print(f"Archived {count} messages")
@@ -6,8 +6,15 @@ from .profile import UserProfile, UserPosition, UserEducation
 from .friend import FriendRequest, Friendship
 from .visit import Visit
 from .notification import Notification
+from .presence import UserPresence
+from .timeline import TimelineEntry
 from .conversation import Conversation
 from .message import Message, message_reads
+from .archive import ArchivedMessage, archived_message_reads
+from ..session import configure_binds
+
+# Chat tables are now all registered; route them to the chat database
+configure_binds()
 
 __all__ = [
     "User",
@@ -21,7 +28,11 @@ __all__ = [
     "Friendship",
     "Visit",
     "Notification",
+    "UserPresence",
+    "TimelineEntry",
     "Conversation",
     "Message",
     "message_reads",
+    "ArchivedMessage",
+    "archived_message_reads",
 ]
@@ -0,0 +1,48 @@
+from datetime import datetime
+from sqlalchemy import Integer, String, DateTime, Text, Table, Column, Index
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from ..session import Base, CHAT_BIND_KEY
+from .user import User
+
+# Cold copies of messages and their read receipts live in the attached "archive"
+# database. Foreign keys cannot span SQLite databases, so joins are declared explicitly.
+archived_message_reads = Table(
+    'message_reads',
+    Base.metadata,
+    Column('message_id', Integer, primary_key=True),
+    Column('user_id', Integer, primary_key=True),
+    Column('read_at', DateTime),
+    schema='archive',
+    info={"bind_key": CHAT_BIND_KEY},
+)
+
+class ArchivedMessage(Base):
+    __tablename__ = "messages"
+    __table_args__ = (
+        Index('ix_archive_messages_conversation_created', 'conversation_id', 'created_at'),
+        {"schema": "archive", "info": {"bind_key": CHAT_BIND_KEY}},
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    conversation_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    sender_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+    content_type: Mapped[str] = mapped_column(String(50), default="text")
+    media_url: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    is_deleted: Mapped[bool] = mapped_column(default=False)
+    edited_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    sender = relationship(
+        "User",
+        primaryjoin="foreign(ArchivedMessage.sender_id) == User.id",
+        viewonly=True,
+    )
+    read_by: Mapped[list["User"]] = relationship(
+        "User",
+        secondary=archived_message_reads,
+        primaryjoin=lambda: ArchivedMessage.id == archived_message_reads.c.message_id,
+        secondaryjoin=lambda: User.id == archived_message_reads.c.user_id,
+        foreign_keys=lambda: [archived_message_reads.c.message_id, archived_message_reads.c.user_id],
+        viewonly=True,
+    )
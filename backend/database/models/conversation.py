@@ -1,7 +1,7 @@
 from datetime import datetime
 from sqlalchemy import Integer, String, DateTime, ForeignKey, Table, Column, Boolean, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from ..session import Base
+from ..session import Base, CHAT_BIND_KEY
 
 # Association table for many-to-many relationship between users and conversations
 conversation_participants = Table(
@@ -11,10 +11,12 @@ conversation_participants = Table(
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
     Column('muted', Boolean, default=False),
     Column('deleted_at', DateTime, nullable=True),
+    info={"bind_key": CHAT_BIND_KEY},
 )
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    __table_args__ = {"info": {"bind_key": CHAT_BIND_KEY}}
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str | None] = mapped_column(String(255), nullable=True)
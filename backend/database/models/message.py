@@ -1,7 +1,7 @@
 from datetime import datetime
 from sqlalchemy import Integer, String, DateTime, ForeignKey, Text, Boolean, Table, Column, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from ..session import Base
+from ..session import Base, CHAT_BIND_KEY
 
 # Association table for tracking which users have read each message
 message_reads = Table(
@@ -10,12 +10,14 @@ message_reads = Table(
     Column('message_id', Integer, ForeignKey('messages.id'), primary_key=True),
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
     Column('read_at', DateTime, default=datetime.utcnow),
+    info={"bind_key": CHAT_BIND_KEY},
 )
 
 class Message(Base):
     __tablename__ = "messages"
     __table_args__ = (
         Index('ix_messages_conversation_created', 'conversation_id', 'created_at'),
+        {"info": {"bind_key": CHAT_BIND_KEY}},
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -16,5 +16,6 @@ class Post(Base):
     media_url: Mapped[str | None] = mapped_column(String(512), nullable=True)
     unique_id: Mapped[str] = mapped_column(String(10), unique=True, nullable=False, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     author: Mapped["User"] = relationship("User", back_populates="posts")
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, JSON
+from datetime import datetime
+from database.session import Base
+
+class UserPresence(Base):
+    """Last known socket presence of a user, snapshotted by the realtime layer"""
+    __tablename__ = "user_presence"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    last_seen = Column(DateTime, nullable=True)
+    session_count = Column(Integer, default=0, nullable=False)
+    typing = Column(JSON, nullable=True)  # [{conversation_id, user_name, expires_at}]
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
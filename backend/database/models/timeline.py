@@ -0,0 +1,19 @@
+from datetime import datetime
+from sqlalchemy import Integer, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from ..session import Base
+
+class TimelineEntry(Base):
+    """A post materialized into one reader's friend timeline at write time"""
+    __tablename__ = "timeline_entries"
+    __table_args__ = (
+        UniqueConstraint('owner_id', 'post_id', name='uq_timeline_owner_post'),
+        # A timeline page is one range scan: owner_id = ? ordered by (created_at, post_id)
+        Index('ix_timeline_owner_created', 'owner_id', 'created_at', 'post_id'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    owner_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    post_id: Mapped[int] = mapped_column(ForeignKey("posts.id", ondelete="CASCADE"), nullable=False, index=True)
+    author_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)  # the post's created_at
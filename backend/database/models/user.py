@@ -15,6 +15,8 @@ class User(Base):
     profile_photo: Mapped[str | None] = mapped_column(String(255), nullable=True)
     cover_photo: Mapped[str | None] = mapped_column(String(255), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Moves on any change to name or photos, which are embedded in posts and stories
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     posts: Mapped[list["Post"]] = relationship("Post", back_populates="author", cascade="all,delete-orphan")
     stories: Mapped[list["Story"]] = relationship("Story", back_populates="author", cascade="all,delete-orphan")
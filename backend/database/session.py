@@ -1,13 +1,134 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from core.config import settings
 
 engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
 
+# Chat tables get their own database file (and writer lock) unless both URLs point
+# at the same database, in which case the chat engine is simply the main engine.
+if settings.CHAT_DATABASE_URL == settings.DATABASE_URL:
+    chat_engine = engine
+else:
+    chat_engine = create_engine(settings.CHAT_DATABASE_URL, connect_args={"check_same_thread": False})
+
+CHAT_BIND_KEY = "chat"
+
+
+def _attach(dbapi_connection, path, alias: str):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"ATTACH DATABASE ? AS {alias}", (str(path),))
+    cursor.close()
+
+
+def _enable_wal(dbapi_connection):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+if chat_engine is engine:
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _attach_archive(dbapi_connection, connection_record):
+            """Attach the cold message archive so the "archive" schema resolves on every connection"""
+            _attach(dbapi_connection, settings.ARCHIVE_DB_PATH, "archive")
+elif engine.dialect.name == "sqlite" and chat_engine.dialect.name == "sqlite":
+    # Each engine attaches the other database so unqualified cross-database joins
+    # (e.g. participants -> users) keep resolving, while writes only lock the file
+    # that owns the table. WAL lets readers of one file proceed during writes to it.
+    #
+    # In WAL mode SQLite does not commit atomically across attached databases: a
+    # crash during a commit that touched two files can keep one file's changes and
+    # lose the other's. Every write path commits to one file per transaction
+    # (ChatService, database/archive.py and the legacy migration below each split
+    # their work), and new code has to do the same.
+    @event.listens_for(engine, "connect")
+    def _attach_chat(dbapi_connection, connection_record):
+        _enable_wal(dbapi_connection)
+        _attach(dbapi_connection, chat_engine.url.database, "chat")
+
+    @event.listens_for(chat_engine, "connect")
+    def _attach_social(dbapi_connection, connection_record):
+        _enable_wal(dbapi_connection)
+        _attach(dbapi_connection, engine.url.database, "social")
+        _attach(dbapi_connection, settings.ARCHIVE_DB_PATH, "archive")
+
 class Base(DeclarativeBase):
     pass
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ChatSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=chat_engine)
+
+
+def chat_tables() -> list:
+    """Tables (including the archive tier) that live in the chat database"""
+    return [t for t in Base.metadata.sorted_tables if t.info.get("bind_key") == CHAT_BIND_KEY]
+
+
+def configure_binds():
+    """Route chat tables to the chat engine for sessions opened via SessionLocal"""
+    SessionLocal.configure(binds={table: chat_engine for table in chat_tables()})
+
+
+def _migrate_legacy_chat_tables(tables: list):
+    """Move chat rows left in the main database by older versions into the chat database
+
+    The copy (chat.db only) and the rename (main database only) are separate
+    transactions. If it stops in between, the next start copies again, which
+    INSERT OR IGNORE makes a no-op, and then renames.
+    """
+    existing = set(inspect(engine).get_table_names())
+    legacy = [t for t in tables if t.schema is None and t.name in existing]
+    if not legacy:
+        return
+    with engine.begin() as conn:
+        for table in legacy:
+            columns = ", ".join(f'"{c.name}"' for c in table.columns)
+            conn.execute(text(
+                f'INSERT OR IGNORE INTO chat."{table.name}" ({columns}) SELECT {columns} FROM main."{table.name}"'
+            ))
+    with engine.begin() as conn:
+        for table in legacy:
+            conn.execute(text(f'ALTER TABLE main."{table.name}" RENAME TO "legacy_{table.name}"'))
+
+
+def _add_missing_columns(bind, tables: list):
+    """Add nullable columns introduced after a table was created, with their indexes
+
+    create_all only creates missing tables, so existing databases would
+    otherwise lack new columns.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names(schema=None))
+    for table in tables:
+        if table.schema is not None or table.name not in existing_tables:
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        added = [c for c in table.columns if c.name not in existing and c.nullable]
+        if not added:
+            continue
+        with bind.begin() as conn:
+            for column in added:
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            for index in table.indexes:
+                if any(c.name in {a.name for a in added} for c in index.columns):
+                    index.create(conn, checkfirst=True)
+
+
+def init_db():
+    """Create every table on the engine that owns it"""
+    if chat_engine is engine:
+        Base.metadata.create_all(bind=engine)
+        _add_missing_columns(engine, Base.metadata.sorted_tables)
+        return
+    tables = chat_tables()
+    social_tables = [t for t in Base.metadata.sorted_tables if t not in tables]
+    Base.metadata.create_all(bind=engine, tables=social_tables)
+    Base.metadata.create_all(bind=chat_engine, tables=tables)
+    _add_missing_columns(engine, social_tables)
+    if engine.dialect.name == "sqlite":
+        _migrate_legacy_chat_tables(tables)
 
 # Dependency
 def get_db():
@@ -6,16 +6,18 @@ from dotenv import load_dotenv
 from socketio import ASGIApp
 import logging
 
-from database.session import Base, engine
+from database.session import init_db
+from core.pagination import NEXT_CURSOR_HEADER
+from core.timeline import timeline_fanout
 from websocket import sio
-from routes import auth as _auth, users as _users, posts as _posts, highlights as _highlights, stories as _stories, friends as _friends, visits as _visits, notifications as _notifications, chat as _chat
+from routes import auth as _auth, users as _users, posts as _posts, highlights as _highlights, stories as _stories, friends as _friends, visits as _visits, notifications as _notifications, chat as _chat, metrics as _metrics
 import database.models as _models  # ensure models are registered
 import core.websocket as _websocket  # register websocket handlers
 
 # Load env from backend/.env
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
 
-Base.metadata.create_all(bind=engine)
+init_db()
 
 app = FastAPI(title="App Backend", version="1.0.0")
 
@@ -34,6 +36,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified"],
 )
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -50,6 +53,19 @@ app.include_router(_friends.router, prefix="/friends", tags=["friends"])
 app.include_router(_visits.router, prefix="/visits", tags=["visits"])
 app.include_router(_notifications.router, prefix="/notifications", tags=["notifications"])
 app.include_router(_chat.router, prefix="/chat", tags=["chat"])
+app.include_router(_metrics.router, prefix="/metrics", tags=["metrics"])
+
+@app.on_event("startup")
+async def startup():
+    await _websocket.start_realtime()
+    timeline_fanout.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await _websocket.stop_realtime()
+    await timeline_fanout.close()
+
 
 @app.get("/")
 def root():
@@ -8,10 +8,13 @@ from schemas.conversation import (
     ConversationDetail, ConversationSearch
 )
 from schemas.message import MessageBase, MessageCreate, MessageUpdate
-from websocket.services import ChatService
+from websocket.services import ChatService, NotificationService
 from dependencies import get_current_user
+from core.config import settings
+from core.websocket import emit_conversation_updated
 import os
 import uuid
+import logging
 from datetime import datetime
 
 router = APIRouter()
@@ -19,20 +22,35 @@ router = APIRouter()
 chat_service = ChatService()
 
 
-def format_conversation(conv: Conversation, current_user_id: int):
-    """Format conversation object for API response"""
-    from sqlalchemy.orm import object_session
+async def notify_conversation_updated(conversation_id: int, fields: dict, **kwargs):
+    """Push an inbox update over the socket; a failed emit never fails the request"""
+    try:
+        await emit_conversation_updated(conversation_id, fields, **kwargs)
+    except Exception as e:
+        logging.warning(f"Failed to emit conversation update: {str(e)}")
+
+
+def format_participant(p: User) -> dict:
+    """Format a conversation member for API responses"""
+    return {
+        "id": p.id,
+        "username": p.username,
+        "first_name": p.first_name,
+        "last_name": p.last_name,
+        "profile_photo": p.profile_photo,
+    }
 
-    # Get the session for this object if it still exists
-    session = object_session(conv)
-    if session:
-        # If still in session, eager load any pending relationships
-        from sqlalchemy.orm import selectinload
-        if not hasattr(conv.participants, '_loaded_value'):
-            try:
-                conv.participants  # trigger load
-            except:
-                pass
+
+def format_conversation(conv: Conversation, current_user_id: int, participants: list = None, participant_count: int = None):
+    """Format conversation object for API response
+
+    Only the first CONVERSATION_PREVIEW_MEMBERS participants are embedded; the
+    full member list is served by the paginated members endpoint.
+    """
+    if participants is None:
+        participants = list(conv.participants)
+    if participant_count is None:
+        participant_count = len(participants)
 
     unread_count = chat_service.get_unread_count(
         conversation_id=conv.id,
@@ -60,24 +78,14 @@ def format_conversation(conv: Conversation, current_user_id: int):
             }
         }
 
-    participants = [
-        {
-            "id": p.id,
-            "username": p.username,
-            "first_name": p.first_name,
-            "last_name": p.last_name,
-            "profile_photo": p.profile_photo,
-        }
-        for p in conv.participants
-    ]
-
     return {
         "id": conv.id,
         "name": conv.name,
         "description": conv.description,
         "is_group": conv.is_group,
         "avatar_url": conv.avatar_url,
-        "participants": participants,
+        "participants": [format_participant(p) for p in participants[:settings.CONVERSATION_PREVIEW_MEMBERS]],
+        "participant_count": participant_count,
         "latest_message": latest_message,
         "unread_count": unread_count,
         "created_at": conv.created_at.isoformat(),
@@ -85,6 +93,22 @@ def format_conversation(conv: Conversation, current_user_id: int):
     }
 
 
+def format_conversations(conversations: list[Conversation], current_user_id: int) -> list[dict]:
+    """Format a page of conversations, loading member previews in two batched queries"""
+    conversation_ids = [conv.id for conv in conversations]
+    previews = chat_service.get_participant_previews(conversation_ids)
+    counts = chat_service.get_participant_counts(conversation_ids)
+    return [
+        format_conversation(
+            conv,
+            current_user_id,
+            participants=previews.get(conv.id, []),
+            participant_count=counts.get(conv.id, 0),
+        )
+        for conv in conversations
+    ]
+
+
 @router.get("/conversations")
 async def get_conversations(
     current_user: User = Depends(get_current_user),
@@ -99,7 +123,6 @@ async def get_conversations(
     db = SessionLocal()
     try:
         query = db.query(Conversation).options(
-            selectinload(Conversation.participants),
             selectinload(Conversation.messages).selectinload(Message.sender),
             selectinload(Conversation.messages).selectinload(Message.read_by)
         ).join(
@@ -118,60 +141,7 @@ async def get_conversations(
             Conversation.updated_at.desc()
         ).limit(limit).offset(offset).all()
 
-        result = []
-        for conv in conversations:
-            unread_count = chat_service.get_unread_count(
-                conversation_id=conv.id,
-                user_id=current_user.id
-            )
-
-            latest_message = None
-            if conv.messages:
-                latest_msg = conv.messages[-1]
-                read_by_ids = [u.id for u in latest_msg.read_by]
-                latest_message = {
-                    "id": latest_msg.id,
-                    "content": latest_msg.content,
-                    "content_type": latest_msg.content_type,
-                    "media_url": latest_msg.media_url,
-                    "is_deleted": latest_msg.is_deleted,
-                    "edited_at": latest_msg.edited_at.isoformat() if latest_msg.edited_at else None,
-                    "created_at": latest_msg.created_at.isoformat(),
-                    "read_by": read_by_ids,
-                    "sender": {
-                        "id": latest_msg.sender.id,
-                        "username": latest_msg.sender.username,
-                        "first_name": latest_msg.sender.first_name,
-                        "last_name": latest_msg.sender.last_name,
-                        "profile_photo": latest_msg.sender.profile_photo,
-                    }
-                }
-
-            participants = [
-                {
-                    "id": p.id,
-                    "username": p.username,
-                    "first_name": p.first_name,
-                    "last_name": p.last_name,
-                    "profile_photo": p.profile_photo,
-                }
-                for p in conv.participants
-            ]
-
-            result.append({
-                "id": conv.id,
-                "name": conv.name,
-                "description": conv.description,
-                "is_group": conv.is_group,
-                "avatar_url": conv.avatar_url,
-                "participants": participants,
-                "latest_message": latest_message,
-                "unread_count": unread_count,
-                "created_at": conv.created_at.isoformat(),
-                "updated_at": conv.updated_at.isoformat(),
-            })
-
-        return result
+        return format_conversations(conversations, current_user.id)
     finally:
         db.close()
 
@@ -189,7 +159,6 @@ async def get_conversation(
         db = SessionLocal()
         try:
             conversation = db.query(Conversation).options(
-                selectinload(Conversation.participants),
                 selectinload(Conversation.messages).selectinload(Message.sender),
                 selectinload(Conversation.messages).selectinload(Message.read_by)
             ).filter(Conversation.id == conversation_id).first()
@@ -197,62 +166,12 @@ async def get_conversation(
             if not conversation:
                 raise HTTPException(status_code=404, detail="Conversation not found")
 
-            # Check if user is a participant - do this while session is active
-            participant_ids = [p.id for p in conversation.participants]
-            if current_user.id not in participant_ids:
+            # Check membership without loading the whole member list
+            if not chat_service.is_participant(conversation_id, current_user.id):
                 raise HTTPException(status_code=403, detail="Not a participant of this conversation")
 
             # Format while session is still active
-            unread_count = chat_service.get_unread_count(
-                conversation_id=conversation.id,
-                user_id=current_user.id
-            )
-
-            latest_message = None
-            if conversation.messages:
-                latest_msg = conversation.messages[-1]
-                read_by_ids = [u.id for u in latest_msg.read_by]
-                latest_message = {
-                    "id": latest_msg.id,
-                    "content": latest_msg.content,
-                    "content_type": latest_msg.content_type,
-                    "media_url": latest_msg.media_url,
-                    "is_deleted": latest_msg.is_deleted,
-                    "edited_at": latest_msg.edited_at.isoformat() if latest_msg.edited_at else None,
-                    "created_at": latest_msg.created_at.isoformat(),
-                    "read_by": read_by_ids,
-                    "sender": {
-                        "id": latest_msg.sender.id,
-                        "username": latest_msg.sender.username,
-                        "first_name": latest_msg.sender.first_name,
-                        "last_name": latest_msg.sender.last_name,
-                        "profile_photo": latest_msg.sender.profile_photo,
-                    }
-                }
-
-            participants = [
-                {
-                    "id": p.id,
-                    "username": p.username,
-                    "first_name": p.first_name,
-                    "last_name": p.last_name,
-                    "profile_photo": p.profile_photo,
-                }
-                for p in conversation.participants
-            ]
-
-            return {
-                "id": conversation.id,
-                "name": conversation.name,
-                "description": conversation.description,
-                "is_group": conversation.is_group,
-                "avatar_url": conversation.avatar_url,
-                "participants": participants,
-                "latest_message": latest_message,
-                "unread_count": unread_count,
-                "created_at": conversation.created_at.isoformat(),
-                "updated_at": conversation.updated_at.isoformat(),
-            }
+            return format_conversations([conversation], current_user.id)[0]
         finally:
             db.close()
     except HTTPException:
@@ -261,6 +180,31 @@ async def get_conversation(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/conversations/{conversation_id}/members")
+async def get_conversation_members(
+    conversation_id: int,
+    current_user: User = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    """Get a page of the members of a conversation"""
+    if not chat_service.is_participant(conversation_id, current_user.id):
+        if not chat_service.get_participant_counts([conversation_id]):
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        raise HTTPException(status_code=403, detail="Not a participant of this conversation")
+
+    members = chat_service.get_members(conversation_id, limit, offset)
+    total = chat_service.get_participant_counts([conversation_id]).get(conversation_id, 0)
+
+    return {
+        "conversation_id": conversation_id,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "members": [format_participant(m) for m in members],
+    }
+
+
 @router.get("/conversations/search")
 async def search_conversations(
     q: str = Query(..., min_length=1),
@@ -275,7 +219,6 @@ async def search_conversations(
     try:
         search_query = f"%{q}%"
         conversations = db.query(Conversation).options(
-            selectinload(Conversation.participants),
             selectinload(Conversation.messages).selectinload(Message.sender),
             selectinload(Conversation.messages).selectinload(Message.read_by)
         ).join(
@@ -290,60 +233,7 @@ async def search_conversations(
             Conversation.updated_at.desc()
         ).limit(limit).all()
 
-        result = []
-        for conv in conversations:
-            unread_count = chat_service.get_unread_count(
-                conversation_id=conv.id,
-                user_id=current_user.id
-            )
-
-            latest_message = None
-            if conv.messages:
-                latest_msg = conv.messages[-1]
-                read_by_ids = [u.id for u in latest_msg.read_by]
-                latest_message = {
-                    "id": latest_msg.id,
-                    "content": latest_msg.content,
-                    "content_type": latest_msg.content_type,
-                    "media_url": latest_msg.media_url,
-                    "is_deleted": latest_msg.is_deleted,
-                    "edited_at": latest_msg.edited_at.isoformat() if latest_msg.edited_at else None,
-                    "created_at": latest_msg.created_at.isoformat(),
-                    "read_by": read_by_ids,
-                    "sender": {
-                        "id": latest_msg.sender.id,
-                        "username": latest_msg.sender.username,
-                        "first_name": latest_msg.sender.first_name,
-                        "last_name": latest_msg.sender.last_name,
-                        "profile_photo": latest_msg.sender.profile_photo,
-                    }
-                }
-
-            participants = [
-                {
-                    "id": p.id,
-                    "username": p.username,
-                    "first_name": p.first_name,
-                    "last_name": p.last_name,
-                    "profile_photo": p.profile_photo,
-                }
-                for p in conv.participants
-            ]
-
-            result.append({
-                "id": conv.id,
-                "name": conv.name,
-                "description": conv.description,
-                "is_group": conv.is_group,
-                "avatar_url": conv.avatar_url,
-                "participants": participants,
-                "latest_message": latest_message,
-                "unread_count": unread_count,
-                "created_at": conv.created_at.isoformat(),
-                "updated_at": conv.updated_at.isoformat(),
-            })
-
-        return result
+        return format_conversations(conversations, current_user.id)
     finally:
         db.close()
 
@@ -360,6 +250,12 @@ async def create_conversation(
         if current_user.id not in user_ids:
             user_ids.insert(0, current_user.id)
 
+        if len(set(user_ids)) > settings.MAX_CONVERSATION_MEMBERS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Conversations are limited to {settings.MAX_CONVERSATION_MEMBERS} members"
+            )
+
         conversation = chat_service.create_conversation(
             user_ids=user_ids,
             name=data.name,
@@ -368,6 +264,8 @@ async def create_conversation(
         )
 
         return format_conversation(conversation, current_user.id)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -395,6 +293,13 @@ async def update_conversation(
             avatar_url=data.avatar_url
         )
 
+        await notify_conversation_updated(conversation_id, {
+            "name": updated.name,
+            "description": updated.description,
+            "avatar_url": updated.avatar_url,
+            "updated_at": updated.updated_at.isoformat(),
+        })
+
         return format_conversation(updated, current_user.id)
     except HTTPException:
         raise
@@ -418,7 +323,11 @@ async def delete_conversation(
         if current_user.id not in participant_ids:
             raise HTTPException(status_code=403, detail="Not a participant of this conversation")
 
-        chat_service.delete_conversation(conversation_id)
+        deleted = chat_service.delete_conversation(conversation_id)
+
+        await notify_conversation_updated(conversation_id, {
+            "deleted_at": deleted.deleted_at.isoformat(),
+        })
 
         return {"message": "Conversation deleted"}
     except HTTPException:
@@ -455,6 +364,12 @@ async def archive_conversation(
             db.commit()
             db.refresh(conversation)
 
+            await notify_conversation_updated(
+                conversation_id,
+                {"archived_at": conversation.archived_at.isoformat()},
+                user_ids=participant_ids,
+            )
+
             return {"message": "Conversation archived successfully", "conversation_id": conversation_id}
         finally:
             db.close()
@@ -492,6 +407,12 @@ async def unarchive_conversation(
             db.commit()
             db.refresh(conversation)
 
+            await notify_conversation_updated(
+                conversation_id,
+                {"archived_at": None},
+                user_ids=participant_ids,
+            )
+
             return {"message": "Conversation unarchived successfully", "conversation_id": conversation_id}
         finally:
             db.close()
@@ -530,6 +451,7 @@ async def get_messages(
 
     # Mark messages as read
     chat_service.mark_conversation_messages_as_read(conversation_id, current_user.id)
+    await notify_conversation_updated(conversation_id, {}, include_unread=True, user_ids=[current_user.id])
 
     messages = chat_service.get_messages(conversation_id, limit, offset)
 
@@ -711,6 +633,9 @@ async def mark_message_read(
             raise HTTPException(status_code=403, detail="Not a participant of this conversation")
 
         chat_service.mark_message_as_read(message_id, current_user.id)
+        await notify_conversation_updated(
+            message.conversation_id, {}, include_unread=True, user_ids=[current_user.id]
+        )
 
         return {"message": "Message marked as read"}
     except HTTPException:
@@ -871,7 +796,7 @@ async def create_message(
         )
 
         read_by_ids = [u.id for u in message.read_by]
-        return {
+        message_payload = {
             "id": message.id,
             "conversation_id": message.conversation_id,
             "content": message.content,
@@ -889,6 +814,17 @@ async def create_message(
                 "profile_photo": message.sender.profile_photo,
             }
         }
+
+        await notify_conversation_updated(
+            message.conversation_id,
+            {
+                "latest_message": NotificationService.create_message_preview(message_payload),
+                "updated_at": message_payload["created_at"],
+            },
+            include_unread=True,
+        )
+
+        return message_payload
     except HTTPException:
         raise
     except Exception as e:
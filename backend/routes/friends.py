@@ -8,6 +8,7 @@ from dependencies import get_current_user
 from database.models import User, FriendRequest, Friendship, UserProfile
 from schemas.friend import FriendRequestCreate, FriendRequestOut, FriendStatusOut, IncomingFriendRequestOut
 from core.websocket import emit_friend_request_notification, emit_friend_request_accepted
+from core.timeline import timeline_fanout
 
 router = APIRouter()
 
@@ -134,6 +135,7 @@ async def accept_request(request_id: int, current: User = Depends(get_current_us
 
     db.commit()
     db.refresh(req)
+    timeline_fanout.friendship_created(req.sender_id, req.receiver_id)
 
     # Get sender info for notification
     sender = db.query(User).filter(User.id == req.sender_id).first()
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends
+from core.websocket import get_realtime_metrics
+from core.timeline import timeline_fanout
+from dependencies import get_current_user
+
+# Operational data; not for anonymous callers
+router = APIRouter(dependencies=[Depends(get_current_user)])
+
+@router.get("/realtime")
+async def realtime_metrics():
+    """Socket.IO connection counts, outbound queue depths and suppression counters"""
+    return get_realtime_metrics()
+
+@router.get("/timeline")
+async def timeline_metrics():
+    """Friend-timeline fan-out queue depth and counters"""
+    return timeline_fanout.get_metrics()
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timedelta
+import asyncio
+import json
 
-from database.session import get_db
+from core.config import settings
+from core.websocket import authenticate_token, subscribe_notifications, unsubscribe_notifications
+from database.session import get_db, SessionLocal
 from dependencies import get_current_user
 from database.models import User, Notification
 from schemas.notification import NotificationOut, NotificationResponse
+from websocket.services.notification_streams import CLOSE_STREAM
 
 router = APIRouter()
 
@@ -25,6 +31,93 @@ def get_notifications(
     notifications = query.order_by(Notification.created_at.desc()).limit(limit).all()
     return notifications
 
+def _sse_event(event: str, data: dict, event_id: int = None) -> str:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+def _load_missed(user_id: int, after_id: Optional[int]) -> tuple[list[tuple[int, str, dict]], bool, int]:
+    """Notifications after the client's last event id, newest SSE_REPLAY_LIMIT of them, plus the unread count"""
+    db = SessionLocal()
+    try:
+        missed = []
+        truncated = False
+        if after_id is not None:
+            rows = db.query(Notification).filter(
+                Notification.user_id == user_id,
+                Notification.id > after_id
+            ).order_by(Notification.id.desc()).limit(settings.SSE_REPLAY_LIMIT + 1).all()
+            truncated = len(rows) > settings.SSE_REPLAY_LIMIT
+            missed = [(n.id, n.type, {**(n.data or {}), "id": n.id}) for n in reversed(rows[:settings.SSE_REPLAY_LIMIT])]
+        unread = db.query(Notification).filter(
+            Notification.user_id == user_id,
+            Notification.read == False
+        ).count()
+        return missed, truncated, unread
+    finally:
+        db.close()
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    token: Optional[str] = Query(None),
+    authorization: Optional[str] = Header(None),
+    last_event_id: Optional[str] = Header(None),
+):
+    """Server-Sent Events feed of the notifications also pushed over the socket
+
+    For clients that can't keep a WebSocket open. EventSource can't send
+    headers, so the token may also come as ?token=. On reconnect the browser
+    sends Last-Event-ID and the notifications created since then are
+    replayed from the table before live events resume.
+    """
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(status_code=401, detail="Token de autenticação ausente")
+    user = await authenticate_token(token)
+    after_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+    async def events():
+        # Subscribe before reading the backlog so nothing created in between is lost
+        queue = subscribe_notifications(user.id)
+        try:
+            yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+            missed, truncated, unread = await asyncio.to_thread(_load_missed, user.id, after_id)
+            if truncated:
+                # Too much to replay; the client should reload GET /notifications
+                yield _sse_event("resync", {"reason": "too_many_missed"})
+            replayed_up_to = after_id or 0
+            for notification_id, event, data in missed:
+                replayed_up_to = notification_id
+                yield _sse_event(event, data, notification_id)
+            yield _sse_event("unread_count", {"unread_count": unread})
+
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=settings.SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                if item is CLOSE_STREAM:
+                    break
+                event, data = item
+                event_id = data.get("id")
+                if event_id is not None and event_id <= replayed_up_to:
+                    continue
+                yield _sse_event(event, data, event_id)
+        finally:
+            unsubscribe_notifications(user.id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/unread-count", response_model=dict)
 def get_unread_count(
     current: User = Depends(get_current_user),
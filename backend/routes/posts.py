@@ -1,12 +1,17 @@
 import os
-from typing import List
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from database.session import get_db
-from database.models import Post
+from database.models import Post, TimelineEntry, User
 from schemas.post import PostCreate, PostOut
 from dependencies import get_current_user
 from core.unique_id import generate_unique_post_id
+from core.config import settings
+from core.pagination import keyset_page
+from core.http_cache import compute_etag, latest, not_modified
+from core.serializers import post_out, serialize_posts
+from core.timeline import timeline_fanout
 
 router = APIRouter()
 
@@ -15,38 +20,52 @@ MEDIA_DIR = os.path.abspath(MEDIA_DIR)
 os.makedirs(MEDIA_DIR, exist_ok=True)
 
 @router.get("/", response_model=List[PostOut])
-def list_posts(db: Session = Depends(get_db)):
-    posts = db.query(Post).order_by(Post.created_at.desc()).all()
-    return [
-        PostOut(
-            id=p.id,
-            content=p.content,
-            media_url=p.media_url,
-            created_at=p.created_at,
-            user_id=p.user_id,
-            user_name=f"{p.author.first_name} {p.author.last_name}" if p.author else "Anônimo",
-            unique_id=p.unique_id,
-            user_profile_photo=p.author.profile_photo if p.author else None,
-            user_cover_photo=p.author.cover_photo if p.author else None,
-        ) for p in posts
-    ]
+def list_posts(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.POSTS_PAGE_SIZE, ge=1, le=settings.POSTS_MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    # Newest first; the next page's cursor comes back in the X-Next-Cursor header
+    page = keyset_page(
+        db.query(Post.id, Post.created_at, Post.updated_at, User.updated_at.label("author_updated_at"))
+        .outerjoin(User, User.id == Post.user_id),
+        Post.created_at, Post.id, cursor, limit, response,
+    )
+    # The page's keys and timestamps are enough to validate a cached copy
+    etag = compute_etag(cursor, limit, [tuple(row) for row in page])
+    last_modified = latest(*(latest(r.created_at, r.updated_at, r.author_updated_at) for r in page))
+    cached = not_modified(request, response, etag, last_modified)
+    if cached is not None:
+        return cached
+    by_id = {p.id: p for p in db.query(Post).filter(Post.id.in_([r.id for r in page]))}
+    posts = [by_id[r.id] for r in page if r.id in by_id]
+    return serialize_posts(db, posts)
+
+@router.get("/timeline", response_model=List[PostOut])
+def friend_timeline(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.POSTS_PAGE_SIZE, ge=1, le=settings.POSTS_MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current=Depends(get_current_user),
+):
+    """Posts of the current user and their friends, newest first, from the materialized timeline"""
+    entries = keyset_page(
+        db.query(TimelineEntry.post_id, TimelineEntry.created_at).filter(TimelineEntry.owner_id == current.id),
+        TimelineEntry.created_at, TimelineEntry.post_id, cursor, limit, response,
+    )
+    by_id = {p.id: p for p in db.query(Post).filter(Post.id.in_([e.post_id for e in entries]))}
+    posts = [by_id[e.post_id] for e in entries if e.post_id in by_id]
+    return serialize_posts(db, posts)
 
 @router.get("/{post_id}", response_model=PostOut)
 def get_post(post_id: int, db: Session = Depends(get_db)):
     p = db.query(Post).filter(Post.id == post_id).first()
     if not p:
         raise HTTPException(status_code=404, detail="Post não encontrado")
-    return PostOut(
-        id=p.id,
-        content=p.content,
-        media_url=p.media_url,
-        created_at=p.created_at,
-        user_id=p.user_id,
-        user_name=f"{p.author.first_name} {p.author.last_name}" if p.author else "Anônimo",
-        unique_id=p.unique_id,
-        user_profile_photo=p.author.profile_photo if p.author else None,
-        user_cover_photo=p.author.cover_photo if p.author else None,
-    )
+    return post_out(p, p.author)
 
 @router.post("/", response_model=PostOut)
 def create_post(payload: PostCreate, db: Session = Depends(get_db), current=Depends(get_current_user)):
@@ -55,17 +74,8 @@ def create_post(payload: PostCreate, db: Session = Depends(get_db), current=Depe
     db.add(post)
     db.commit()
     db.refresh(post)
-    return PostOut(
-        id=post.id,
-        content=post.content,
-        media_url=post.media_url,
-        created_at=post.created_at,
-        user_id=current.id,
-        user_name=f"{current.first_name} {current.last_name}",
-        unique_id=post.unique_id,
-        user_profile_photo=current.profile_photo,
-        user_cover_photo=current.cover_photo,
-    )
+    timeline_fanout.post_created(post)
+    return post_out(post, current)
 
 @router.post("/upload", response_model=PostOut)
 def create_post_with_upload(
@@ -90,18 +100,9 @@ def create_post_with_upload(
     db.add(post)
     db.commit()
     db.refresh(post)
+    timeline_fanout.post_created(post)
 
-    return PostOut(
-        id=post.id,
-        content=post.content,
-        media_url=post.media_url,
-        created_at=post.created_at,
-        user_id=current.id,
-        user_name=f"{current.first_name} {current.last_name}",
-        unique_id=post.unique_id,
-        user_profile_photo=current.profile_photo,
-        user_cover_photo=current.cover_photo,
-    )
+    return post_out(post, current)
 
 @router.delete("/{post_id}")
 def delete_post(post_id: int, db: Session = Depends(get_db), current=Depends(get_current_user)):
@@ -110,6 +111,7 @@ def delete_post(post_id: int, db: Session = Depends(get_db), current=Depends(get
         raise HTTPException(status_code=404, detail="Post não encontrado")
     if post.user_id != current.id:
         raise HTTPException(status_code=403, detail="Você não tem permissão para deletar este post")
+    db.query(TimelineEntry).filter(TimelineEntry.post_id == post.id).delete(synchronize_session=False)
     db.delete(post)
     db.commit()
     return {"message": "Post deletado com sucesso"}
@@ -131,14 +133,4 @@ def update_post(
         post.media_url = payload.media_url
     db.commit()
     db.refresh(post)
-    return PostOut(
-        id=post.id,
-        content=post.content,
-        media_url=post.media_url,
-        created_at=post.created_at,
-        user_id=post.user_id,
-        unique_id=post.unique_id,
-        user_name=f"{post.author.first_name} {post.author.last_name}" if post.author else "Anônimo",
-        user_profile_photo=post.author.profile_photo if post.author else None,
-        user_cover_photo=post.author.cover_photo if post.author else None,
-    )
+    return post_out(post, post.author)
@@ -1,11 +1,14 @@
 import os
 from typing import List
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request, Response
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from database.session import get_db
-from database.models import Story
+from database.models import Story, User
 from schemas.story import StoryCreate, StoryOut
 from dependencies import get_current_user
+from core.http_cache import compute_etag, latest, not_modified
+from core.serializers import serialize_stories, story_out
 
 router = APIRouter()
 
@@ -14,34 +17,26 @@ MEDIA_DIR = os.path.abspath(MEDIA_DIR)
 os.makedirs(MEDIA_DIR, exist_ok=True)
 
 @router.get("/", response_model=List[StoryOut])
-def list_stories(db: Session = Depends(get_db)):
+def list_stories(request: Request, response: Response, db: Session = Depends(get_db)):
+    # Stories are never edited: count and newest id/time change on every create or delete.
+    # Authors' names and photos are embedded, so any user change counts too (ix_users_updated_at)
+    count, max_id, newest, authors_updated = db.query(
+        func.count(Story.id), func.max(Story.id), func.max(Story.created_at),
+        db.query(func.max(User.updated_at)).scalar_subquery(),
+    ).one()
+    etag = compute_etag(count, max_id, newest, authors_updated)
+    cached = not_modified(request, response, etag, latest(newest, authors_updated))
+    if cached is not None:
+        return cached
     stories = db.query(Story).order_by(Story.created_at.desc()).all()
-    return [
-        StoryOut(
-            id=s.id,
-            content=s.content,
-            media_url=s.media_url,
-            created_at=s.created_at,
-            user_id=s.user_id,
-            user_name=f"{s.author.first_name} {s.author.last_name}" if s.author else "Anônimo",
-            user_profile_photo=s.author.profile_photo if s.author else None,
-        ) for s in stories
-    ]
+    return serialize_stories(db, stories)
 
 @router.get("/{story_id}", response_model=StoryOut)
 def get_story(story_id: int, db: Session = Depends(get_db)):
     s = db.query(Story).filter(Story.id == story_id).first()
     if not s:
         raise HTTPException(status_code=404, detail="Story não encontrado")
-    return StoryOut(
-        id=s.id,
-        content=s.content,
-        media_url=s.media_url,
-        created_at=s.created_at,
-        user_id=s.user_id,
-        user_name=f"{s.author.first_name} {s.author.last_name}" if s.author else "Anônimo",
-        user_profile_photo=s.author.profile_photo if s.author else None,
-    )
+    return story_out(s, s.author)
 
 @router.post("/", response_model=StoryOut)
 def create_story(payload: StoryCreate, db: Session = Depends(get_db), current=Depends(get_current_user)):
@@ -49,15 +44,7 @@ def create_story(payload: StoryCreate, db: Session = Depends(get_db), current=De
     db.add(story)
     db.commit()
     db.refresh(story)
-    return StoryOut(
-        id=story.id,
-        content=story.content,
-        media_url=story.media_url,
-        created_at=story.created_at,
-        user_id=current.id,
-        user_name=f"{current.first_name} {current.last_name}",
-        user_profile_photo=current.profile_photo,
-    )
+    return story_out(story, current)
 
 @router.post("/upload", response_model=StoryOut)
 def create_story_with_upload(
@@ -82,15 +69,7 @@ def create_story_with_upload(
     db.add(story)
     db.commit()
     db.refresh(story)
-    return StoryOut(
-        id=story.id,
-        content=story.content,
-        media_url=story.media_url,
-        created_at=story.created_at,
-        user_id=current.id,
-        user_name=f"{current.first_name} {current.last_name}",
-        user_profile_photo=current.profile_photo,
-    )
+    return story_out(story, current)
 
 @router.delete("/{story_id}")
 def delete_story(story_id: int, db: Session = Depends(get_db), current=Depends(get_current_user)):
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Form
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Form, Request, Response
 from sqlalchemy.orm import Session
 from database.session import get_db
 from schemas.user import UserBase
@@ -7,10 +7,16 @@ from schemas.profile import ProfileOut, ProfileUpdate
 from dependencies import get_current_user
 from database.models import User, Post, UserProfile, UserPosition, UserEducation
 from core.unique_id import generate_unique_profile_id
+from core.config import settings
+from core.pagination import keyset_page
+from core.http_cache import compute_etag, latest, not_modified
+from core.serializers import serialize_posts
+from core.websocket import refresh_user_card, get_online_status, get_last_seen
 import os
 import uuid
 from pathlib import Path
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
 router = APIRouter()
 
@@ -42,6 +48,25 @@ async def search_users(q: str = Query(""), db: Session = Depends(get_db)):
         for u in users
     ]
 
+@router.get("/online-status")
+async def online_status(ids: List[int] = Query(...)):
+    """Online status and last seen of many users in one call: /users/online-status?ids=1&ids=2"""
+    unique_ids = list(dict.fromkeys(ids))
+    if len(unique_ids) > settings.PRESENCE_STATUS_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {settings.PRESENCE_STATUS_MAX_IDS} ids por consulta")
+    status = await get_online_status(unique_ids)
+    last_seen = get_last_seen(unique_ids)
+    return {
+        "statuses": [
+            {
+                "user_id": uid,
+                "online": status[uid],
+                "last_seen": last_seen[uid].isoformat() if uid in last_seen else None,
+            }
+            for uid in unique_ids
+        ]
+    }
+
 @router.get("/{user_id}", response_model=UserBase)
 async def get_user(user_id: str, db: Session = Depends(get_db)):
     user = None
@@ -55,7 +80,14 @@ async def get_user(user_id: str, db: Session = Depends(get_db)):
     return user
 
 @router.get("/{user_id}/posts", response_model=List[PostOut])
-async def get_user_posts(user_id: str, db: Session = Depends(get_db)):
+async def get_user_posts(
+    user_id: str,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.POSTS_PAGE_SIZE, ge=1, le=settings.POSTS_MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
     user = None
     if user_id.isdigit():
         user = db.query(User).filter(User.id == int(user_id)).first()
@@ -65,20 +97,19 @@ async def get_user_posts(user_id: str, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
-    posts = db.query(Post).filter(Post.user_id == user.id).order_by(Post.created_at.desc()).all()
-    return [
-        PostOut(
-            id=p.id,
-            content=p.content,
-            media_url=p.media_url,
-            created_at=p.created_at,
-            user_id=p.user_id,
-            user_name=f"{p.author.first_name} {p.author.last_name}" if p.author else "Anônimo",
-            unique_id=p.unique_id,
-            user_profile_photo=p.author.profile_photo if p.author else None,
-            user_cover_photo=p.author.cover_photo if p.author else None,
-        ) for p in posts
-    ]
+    # Range scan on ix_posts_user_created; next page's cursor is in X-Next-Cursor
+    page = keyset_page(
+        db.query(Post.id, Post.created_at, Post.updated_at).filter(Post.user_id == user.id),
+        Post.created_at, Post.id, cursor, limit, response,
+    )
+    etag = compute_etag(user.id, user.updated_at, cursor, limit, [tuple(row) for row in page])
+    last_modified = latest(user.updated_at, *(latest(r.created_at, r.updated_at) for r in page))
+    cached = not_modified(request, response, etag, last_modified)
+    if cached is not None:
+        return cached
+    by_id = {p.id: p for p in db.query(Post).filter(Post.id.in_([r.id for r in page]))}
+    posts = [by_id[r.id] for r in page if r.id in by_id]
+    return serialize_posts(db, posts, authors={user.id: user})
 
 @router.post("/profile-photo")
 async def update_profile_photo(
@@ -112,6 +143,13 @@ async def update_profile_photo(
         db.commit()
         db.refresh(current)
 
+        # Open sockets cache the avatar; refresh them so chat/typing events show the new photo
+        try:
+            await refresh_user_card(current)
+        except Exception as e:
+            import logging
+            logging.warning(f"Failed to refresh socket user card: {str(e)}")
+
         return {
             "success": True,
             "profile_photo": media_url,
@@ -253,6 +291,8 @@ async def update_my_profile(
     prof.show_contact_email = payload.show_contact_email
     prof.show_contact_phone = payload.show_contact_phone
     prof.show_workplace = payload.show_workplace
+    # Positions and education are rewritten below, which onupdate doesn't see; the profile ETag relies on this
+    prof.updated_at = datetime.utcnow()
 
     db.query(UserPosition).filter(UserPosition.user_id == current.id).delete()
     db.query(UserEducation).filter(UserEducation.user_id == current.id).delete()
@@ -299,7 +339,7 @@ async def update_my_profile(
     )
 
 @router.get("/{user_id}/profile", response_model=ProfileOut)
-async def get_user_profile(user_id: str, db: Session = Depends(get_db)):
+async def get_user_profile(user_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
     user = None
     if user_id.isdigit():
         user = db.query(User).filter(User.id == int(user_id)).first()
@@ -310,6 +350,11 @@ async def get_user_profile(user_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
     prof = db.query(UserProfile).filter(UserProfile.user_id == user.id).first()
+    # Updating the profile touches updated_at, positions and education included
+    etag = compute_etag(user.id, user.email, user.updated_at, prof.id if prof else None, prof.updated_at if prof else None)
+    cached = not_modified(request, response, etag, latest(user.updated_at, prof.updated_at if prof else None))
+    if cached is not None:
+        return cached
     positions = db.query(UserPosition).filter(UserPosition.user_id == user.id).all()
     education = db.query(UserEducation).filter(UserEducation.user_id == user.id).all()
 
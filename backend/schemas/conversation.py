@@ -47,6 +47,7 @@ class ConversationBase(BaseModel):
     created_at: datetime
     updated_at: datetime
     participants: list[UserInfo]
+    participant_count: int = 0
 
     class Config:
         from_attributes = True
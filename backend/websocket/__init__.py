@@ -2,6 +2,16 @@ from socketio import AsyncServer
 from core.config import settings
 import os
 
+# Packet serializers selectable per deployment; clients must use the matching
+# parser (socket.io-msgpack-parser for "msgpack")
+SERIALIZERS = {
+    "json": "default",
+    "msgpack": "msgpack",
+}
+
+if settings.SOCKETIO_SERIALIZER not in SERIALIZERS:
+    raise ValueError(f"Unsupported SOCKETIO_SERIALIZER: {settings.SOCKETIO_SERIALIZER}")
+
 sio = AsyncServer(
     async_mode='asgi',
     cors_allowed_origins=os.getenv('CORS_ORIGINS', '*').split(',') if os.getenv('CORS_ORIGINS') != '*' else '*',
@@ -10,6 +20,7 @@ sio = AsyncServer(
     ping_interval=25,
     logger=True,
     engineio_logger=True,
+    serializer=SERIALIZERS[settings.SOCKETIO_SERIALIZER],
 )
 
 __all__ = ['sio']
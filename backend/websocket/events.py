@@ -5,13 +5,22 @@ class SocketEvents:
     # Connection events
     CONNECT = "connect"
     DISCONNECT = "disconnect"
+    RATE_LIMITED = "rate_limited"
+    SERVER_RESTARTING = "server_restarting"
+    BATCH = "batch"
     
     # Chat events
     CHAT_MESSAGE = "chat_message"
     MESSAGE_READ = "message_read"
+    MESSAGE_READ_CONFIRMED = "message_read_confirmed"
+    READ_UP_TO = "read_up_to"
     TYPING_START = "typing_start"
     TYPING_STOP = "typing_stop"
     CONVERSATION_CREATED = "conversation_created"
+    CONVERSATION_UPDATED = "conversation_updated"
+    
+    # Presence events
+    PRESENCE_UPDATE = "presence_update"
     
     # Notification events
     PROFILE_VISIT = "profile_visit"
@@ -1,3 +1,5 @@
+import asyncio
+import time
 from fastapi import HTTPException, status
 from jose import JWTError, jwt
 from core.config import settings
@@ -5,31 +7,116 @@ from database.session import SessionLocal
 from database.models import User
 
 class AuthHandler:
-    """Handles WebSocket authentication"""
-    
-    @staticmethod
-    async def authenticate_socket(auth: dict) -> User:
+    """Handles WebSocket authentication
+
+    Verified tokens are cached with their user until the token expires, so a
+    reconnect storm costs one dictionary lookup per socket. Cache misses
+    decode the token and load the user in a worker thread, and concurrent
+    misses for the same token share a single lookup.
+    """
+
+    # Share of the cache freed when it fills up
+    EVICT_FRACTION = 0.1
+
+    def __init__(self, max_cache_size: int = None):
+        self.max_cache_size = max_cache_size or settings.AUTH_TOKEN_CACHE_MAX_SIZE
+        self._cache: dict[str, tuple[float, User]] = {}  # token -> (exp, detached user)
+        self._tokens_by_user: dict[int, set[str]] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def authenticate_socket(self, auth: dict) -> User:
         """Authenticate a socket connection using JWT token"""
         if not auth or 'token' not in auth:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Missing authentication token"
             )
-        
+
         token = auth['token']
+        cached = self._cache.get(token)
+        if cached is not None:
+            expires_at, user = cached
+            if time.time() < expires_at:
+                self.hits += 1
+                return user
+            self._forget(token)
+
+        self.misses += 1
+        inflight = self._inflight.get(token)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[token] = future
+        try:
+            user = await self._verify(token)
+            future.set_result(user)
+            return user
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        finally:
+            del self._inflight[token]
+
+    async def _verify(self, token: str) -> User:
+        expires_at, user = await asyncio.to_thread(self._verify_sync, token)
+        self._store(token, expires_at, user)
+        return user
+
+    @staticmethod
+    def _verify_sync(token: str) -> tuple[float, User]:
+        """Decode the token and load its user; runs in a worker thread"""
         try:
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            email: str | None = payload.get("sub")
-            if email is None:
-                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-            
-            db = SessionLocal()
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+        email: str | None = payload.get("sub")
+        if email is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+
+        db = SessionLocal()
+        try:
             user = db.query(User).filter(User.email == email).first()
-            db.close()
-            
             if user is None:
                 raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-            
-            return user
-        except JWTError:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+            db.expunge(user)
+        finally:
+            db.close()
+        return float(payload.get("exp", 0)), user
+
+    def _store(self, token: str, expires_at: float, user: User):
+        if expires_at <= time.time():
+            return
+        if len(self._cache) >= self.max_cache_size:
+            self._evict()
+        self._cache[token] = (expires_at, user)
+        self._tokens_by_user.setdefault(user.id, set()).add(token)
+
+    def _evict(self):
+        """Make room for a batch of inserts at once, so the scan is amortized over them"""
+        now = time.time()
+        for token in [t for t, (expires_at, _) in self._cache.items() if expires_at <= now]:
+            self._forget(token)
+        # Still mostly full: drop the oldest entries (dicts keep insertion order)
+        target = self.max_cache_size - max(1, int(self.max_cache_size * self.EVICT_FRACTION))
+        while len(self._cache) > target:
+            self._forget(next(iter(self._cache)))
+
+    def _forget(self, token: str):
+        entry = self._cache.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_user.get(entry[1].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry[1].id]
+
+    def invalidate_user(self, user_id: int):
+        """Drop cached tokens of a user whose profile changed"""
+        for token in list(self._tokens_by_user.get(user_id, ())):
+            self._forget(token)
@@ -1,29 +1,118 @@
-from websocket.services import ChatService, NotificationService, ConnectionService
+import asyncio
+import logging
+from collections import OrderedDict
+from core.config import settings
+from websocket.services import ChatService, NotificationService, ConnectionService, FanoutService, MessageWritePipeline, ReadReceiptCoalescer
 from websocket.events import SocketEvents
-from database.models import User
+
+logger = logging.getLogger(__name__)
 
 class ChatHandler:
     """Handles chat-related WebSocket events"""
 
-    def __init__(self, sio, connection_service: ConnectionService):
+    def __init__(self, sio, connection_service: ConnectionService, fanout_service: FanoutService = None):
         self.sio = sio
         self.connection_service = connection_service
+        self.fanout_service = fanout_service or FanoutService(sio, connection_service)
         self.chat_service = ChatService()
+        self.message_pipeline = MessageWritePipeline(self.chat_service)
         self.notification_service = NotificationService()
+        self._typing_sweeper: asyncio.Task | None = None
+        self.read_receipts = ReadReceiptCoalescer(self.flush_read_up_to)
+        self._latest_message_sent: dict[int, int] = {}  # conversation_id -> newest message id in a sent preview
+        self._participants: OrderedDict[int, tuple[int, ...]] = OrderedDict()  # LRU of conversation_id -> user ids
+
+    def get_participant_ids(self, conversation_id: int) -> tuple[int, ...]:
+        """Participant ids from the LRU cache, loading them from the chat database on a miss
+
+        Membership is only written when a conversation is created. Anything
+        that changes it later must call invalidate_participants.
+        """
+        participant_ids = self._participants.get(conversation_id)
+        if participant_ids is not None:
+            self._participants.move_to_end(conversation_id)
+            return participant_ids
+        participant_ids = tuple(self.chat_service.get_participant_ids(conversation_id))
+        # Not cached when empty, so an id that doesn't exist yet can't pin an empty list
+        if participant_ids:
+            self._participants[conversation_id] = participant_ids
+            if len(self._participants) > settings.PARTICIPANT_CACHE_MAX_SIZE:
+                self._participants.popitem(last=False)
+        return participant_ids
+
+    def invalidate_participants(self, conversation_id: int):
+        self._participants.pop(conversation_id, None)
+
+    async def emit_to_conversation(
+        self,
+        conversation_id: int,
+        event: str,
+        payload: dict,
+        exclude_sid: str = None,
+        exclude_user_id: int = None,
+    ) -> int:
+        """Emit an event to every participant session of a conversation"""
+        participant_ids = self.get_participant_ids(conversation_id)
+        return await self.fanout_service.emit_to_users(
+            event,
+            payload,
+            participant_ids,
+            exclude_sid=exclude_sid,
+            exclude_user_id=exclude_user_id,
+        )
+
+    async def emit_conversation_updated(
+        self,
+        conversation_id: int,
+        fields: dict,
+        include_unread: bool = False,
+        user_ids: list[int] = None,
+    ) -> int:
+        """Emit only the changed inbox fields of a conversation to each participant's user room
+
+        A latest_message delta carries its message id as message_id, so
+        clients can ignore a preview older than the one they show. Handlers
+        of the same batch can finish out of order; a preview older than one
+        already sent for the conversation is dropped here.
+        """
+        if "latest_message" in fields:
+            message_id = fields["latest_message"]["id"]
+            if message_id <= self._latest_message_sent.get(conversation_id, 0):
+                fields = {k: v for k, v in fields.items() if k not in ("latest_message", "updated_at")}
+                if not fields and not include_unread:
+                    return 0
+            else:
+                self._latest_message_sent[conversation_id] = message_id
+                fields = {**fields, "message_id": message_id}
+        if user_ids is None:
+            user_ids = self.get_participant_ids(conversation_id)
+        online_ids = list(await self.connection_service.get_online_user_ids(user_ids))
+        if not online_ids:
+            return 0
+
+        unread_counts = self.chat_service.get_unread_counts(conversation_id, online_ids) if include_unread else {}
+        payloads = {}
+        for uid in online_ids:
+            payload = {"conversation_id": conversation_id, **fields}
+            if include_unread:
+                payload["unread_count"] = unread_counts.get(uid, 0)
+            payloads[uid] = payload
+
+        return await self.fanout_service.emit_to_user_rooms(SocketEvents.CONVERSATION_UPDATED, payloads)
 
     async def handle_send_message(
         self,
-        user: User,
+        sender: dict,
         conversation_id: int,
         content: str,
         content_type: str = "text",
         media_url: str = None,
     ) -> dict:
-        """Handle sending a message"""
+        """Handle sending a message from the user card cached on the socket session"""
         try:
-            message = self.chat_service.create_message(
+            message = await self.message_pipeline.submit(
                 conversation_id=conversation_id,
-                sender_id=user.id,
+                sender_id=sender["id"],
                 content=content,
                 content_type=content_type,
                 media_url=media_url,
@@ -34,11 +123,7 @@ class ChatHandler:
             payload = {
                 "id": message.id,
                 "conversation_id": message.conversation_id,
-                "sender": {
-                    "id": user.id,
-                    "name": f"{user.first_name} {user.last_name}".strip(),
-                    "avatar": user.profile_photo,
-                },
+                "sender": sender,
                 "content": message.content,
                 "content_type": message.content_type,
                 "media_url": message.media_url,
@@ -65,6 +150,25 @@ class ChatHandler:
         except Exception as e:
             raise Exception(f"Error marking message as read: {str(e)}")
 
+    def handle_read_up_to(self, user_id: int, conversation_id: int, message_id: int):
+        """Queue a read receipt; receipts within the coalescing window become one write and one broadcast"""
+        self.read_receipts.add(user_id, conversation_id, message_id)
+
+    async def flush_read_up_to(self, user_id: int, conversation_id: int, read_up_to: int):
+        """Persist a coalesced receipt and tell the conversation once"""
+        marked = await asyncio.to_thread(self.chat_service.mark_read_up_to, conversation_id, user_id, read_up_to)
+        read_data = {
+            "conversation_id": conversation_id,
+            "user_id": user_id,
+            "message_id": read_up_to,
+            "read_up_to": read_up_to,
+        }
+        await self.fanout_service.emit_to_user(SocketEvents.MESSAGE_READ_CONFIRMED, read_data, user_id)
+        if not marked:
+            return
+        await self.emit_to_conversation(conversation_id, SocketEvents.MESSAGE_READ, read_data, exclude_user_id=user_id)
+        await self.emit_conversation_updated(conversation_id, {}, include_unread=True, user_ids=[user_id])
+
     async def handle_delete_message(self, message_id: int):
         """Handle message deletion"""
         try:
@@ -94,24 +198,57 @@ class ChatHandler:
 
     async def handle_typing(
         self,
-        user: User,
+        user: dict,
         conversation_id: int,
         is_typing: bool,
-    ) -> dict:
-        """Handle typing indicator"""
-        try:
-            if is_typing:
-                self.connection_service.add_typing_user(conversation_id, user.id)
-            else:
-                self.connection_service.remove_typing_user(conversation_id, user.id)
+    ) -> int:
+        """Track typing state and broadcast only the transitions the throttle lets through"""
+        if is_typing:
+            changed = self.connection_service.start_typing(conversation_id, user["id"], user["name"])
+        else:
+            changed = self.connection_service.stop_typing(conversation_id, user["id"])
+        if not changed:
+            return 0
+        return await self.emit_typing(conversation_id, user["id"], user["name"], is_typing)
 
-            payload = self.notification_service.create_typing_payload(
-                conversation_id=conversation_id,
-                user_id=user.id,
-                user_name=f"{user.first_name} {user.last_name}".strip(),
-                typing=is_typing,
-            )
+    async def emit_typing(self, conversation_id: int, user_id: int, user_name: str, is_typing: bool) -> int:
+        """Emit typing_start/typing_stop to every participant except the typist"""
+        payload = {
+            "user_id": user_id,
+            "user_name": user_name,
+            "conversation_id": conversation_id,
+            "typing": is_typing,
+        }
+        event = SocketEvents.TYPING_START if is_typing else SocketEvents.TYPING_STOP
+        return await self.emit_to_conversation(conversation_id, event, payload, exclude_user_id=user_id)
 
-            return payload
-        except Exception as e:
-            raise Exception(f"Error handling typing: {str(e)}")
+    async def stop_user_typing(self, user_id: int) -> int:
+        """Emit typing_stop for every conversation a user was typing in, once they have no session left"""
+        emitted = 0
+        for conversation_id, uid, user_name in self.connection_service.clear_user_typing(user_id):
+            emitted += await self.emit_typing(conversation_id, uid, user_name, False)
+        return emitted
+
+    def start_typing_sweeper(self):
+        """Start the background task that expires stale typing states"""
+        if self._typing_sweeper is None or self._typing_sweeper.done():
+            self._typing_sweeper = asyncio.create_task(self._sweep_typing())
+
+    async def stop_typing_sweeper(self):
+        if self._typing_sweeper is not None:
+            self._typing_sweeper.cancel()
+            try:
+                await self._typing_sweeper
+            except asyncio.CancelledError:
+                pass
+            self._typing_sweeper = None
+
+    async def _sweep_typing(self):
+        while True:
+            await asyncio.sleep(settings.TYPING_SWEEP_INTERVAL_SECONDS)
+            # A client that vanished without sending typing_stop still gets cleared for everyone else
+            for conversation_id, user_id, user_name in self.connection_service.expire_typing():
+                try:
+                    await self.emit_typing(conversation_id, user_id, user_name, False)
+                except Exception as e:
+                    logger.warning(f"Failed to emit typing expiry: {e}")
@@ -1,14 +1,15 @@
 from database.models import Notification
 from database.session import SessionLocal
-from websocket.services import NotificationService, ConnectionService
+from websocket.services import NotificationService, ConnectionService, FanoutService
 from websocket.events import SocketEvents
 
 class NotificationHandler:
     """Handles notification-related WebSocket events"""
     
-    def __init__(self, sio, connection_service: ConnectionService):
+    def __init__(self, sio, connection_service: ConnectionService, fanout_service: FanoutService = None):
         self.sio = sio
         self.connection_service = connection_service
+        self.fanout_service = fanout_service or FanoutService(sio, connection_service)
         self.notification_service = NotificationService()
     
     async def emit_profile_visit(
@@ -38,11 +39,10 @@ class NotificationHandler:
             )
             db.add(notification)
             db.commit()
+            notification_data["id"] = notification.id
             
-            if self.connection_service.is_user_online(visited_user_id):
-                sessions = self.connection_service.get_user_sessions(visited_user_id)
-                for sid in sessions:
-                    await self.sio.emit(SocketEvents.PROFILE_VISIT, notification_data, to=sid)
+            # Fan-out reaches sessions on every worker, not just this one
+            await self.fanout_service.emit_to_user(SocketEvents.PROFILE_VISIT, notification_data, visited_user_id)
         finally:
             db.close()
     
@@ -73,11 +73,10 @@ class NotificationHandler:
             )
             db.add(notification)
             db.commit()
+            notification_data["id"] = notification.id
             
-            if self.connection_service.is_user_online(receiver_id):
-                sessions = self.connection_service.get_user_sessions(receiver_id)
-                for sid in sessions:
-                    await self.sio.emit(SocketEvents.FRIEND_REQUEST, notification_data, to=sid)
+            # Fan-out reaches sessions on every worker, not just this one
+            await self.fanout_service.emit_to_user(SocketEvents.FRIEND_REQUEST, notification_data, receiver_id)
         finally:
             db.close()
     
@@ -108,11 +107,10 @@ class NotificationHandler:
             )
             db.add(notification)
             db.commit()
+            notification_data["id"] = notification.id
             
-            if self.connection_service.is_user_online(requester_id):
-                sessions = self.connection_service.get_user_sessions(requester_id)
-                for sid in sessions:
-                    await self.sio.emit(SocketEvents.FRIEND_REQUEST_ACCEPTED, notification_data, to=sid)
+            # Fan-out reaches sessions on every worker, not just this one
+            await self.fanout_service.emit_to_user(SocketEvents.FRIEND_REQUEST_ACCEPTED, notification_data, requester_id)
         finally:
             db.close()
     
@@ -148,11 +146,10 @@ class NotificationHandler:
             )
             db.add(notification)
             db.commit()
+            notification_data["id"] = notification.id
             
-            if self.connection_service.is_user_online(post_author_id):
-                sessions = self.connection_service.get_user_sessions(post_author_id)
-                for sid in sessions:
-                    await self.sio.emit(SocketEvents.POST_COMMENT, notification_data, to=sid)
+            # Fan-out reaches sessions on every worker, not just this one
+            await self.fanout_service.emit_to_user(SocketEvents.POST_COMMENT, notification_data, post_author_id)
         finally:
             db.close()
     
@@ -187,10 +184,9 @@ class NotificationHandler:
             )
             db.add(notification)
             db.commit()
+            notification_data["id"] = notification.id
             
-            if self.connection_service.is_user_online(post_author_id):
-                sessions = self.connection_service.get_user_sessions(post_author_id)
-                for sid in sessions:
-                    await self.sio.emit(SocketEvents.POST_LIKE, notification_data, to=sid)
+            # Fan-out reaches sessions on every worker, not just this one
+            await self.fanout_service.emit_to_user(SocketEvents.POST_LIKE, notification_data, post_author_id)
         finally:
             db.close()
@@ -1,5 +1,20 @@
+from .backplane import Backplane, InProcessBackplane, RespBackplane, create_backplane
 from .chat_service import ChatService
 from .notification_service import NotificationService
 from .connection_service import ConnectionService
+from .fanout_service import FanoutService
+from .message_pipeline import MessageWritePipeline
+from .presence_service import PresenceService
+from .read_receipts import ReadReceiptCoalescer
+from .outbound_queue import OutboundQueues
+from .rate_limiter import RateLimiter
+from .presence_snapshot import PresenceSnapshotService
+from .metrics import RealtimeMetrics, realtime_metrics
+from .notification_streams import NotificationStreams
 
-__all__ = ['ChatService', 'NotificationService', 'ConnectionService']
+__all__ = [
+    'Backplane', 'InProcessBackplane', 'RespBackplane', 'create_backplane',
+    'ChatService', 'NotificationService', 'ConnectionService', 'FanoutService', 'MessageWritePipeline',
+    'PresenceService', 'ReadReceiptCoalescer', 'OutboundQueues', 'RateLimiter',
+    'PresenceSnapshotService', 'RealtimeMetrics', 'realtime_metrics',
+    'NotificationStreams']
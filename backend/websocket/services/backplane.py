@@ -0,0 +1,325 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Awaitable, Callable, Iterable
+from urllib.parse import urlparse
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[dict], Awaitable[None]]
+PresenceLostHandler = Callable[[list[int]], None]
+
+
+class Backplane:
+    """Cross-worker fan-out and presence
+
+    Every worker delivers an emit to its own sessions first and then publishes
+    it here, so workers holding other sessions of the same users deliver it too.
+    """
+
+    distributed = False
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+
+    async def start(self, on_message: MessageHandler, on_presence_lost: PresenceLostHandler = None):
+        """Start receiving messages published by other workers
+
+        on_presence_lost is called with the users who went offline because a
+        worker holding their last sessions died.
+        """
+
+    async def publish(self, message: dict):
+        """Publish an emit for the other workers"""
+
+    async def incr_presence(self, user_id: int, amount: int) -> int | None:
+        """Adjust the number of sessions a user has across all workers
+
+        Returns the user's session count across all workers after the change,
+        or None when only this worker's sessions count.
+        """
+
+    async def get_presence(self, user_ids: Iterable[int]) -> dict[int, int]:
+        """Get the session count of each user across all workers"""
+        return {}
+
+    async def close(self):
+        """Release connections"""
+
+
+class InProcessBackplane(Backplane):
+    """Single-worker default: local delivery and ConnectionService already cover everything"""
+
+
+class RespBackplane(Backplane):
+    """Backplane over the Redis protocol (RESP)
+
+    Works with Redis itself or any stand-in speaking PUBLISH/SUBSCRIBE, hash,
+    set and SET EX commands, over TCP (redis://host:port/db) or a local socket
+    (unix:///path/to.sock).
+
+    Each worker counts its own sessions in a hash of its own and keeps an
+    alive key with a TTL fresh. Presence sums the hashes of live workers
+    only, so a worker that dies without running its disconnects stops
+    counting once its alive key expires; the next heartbeat of any worker
+    deletes what it left behind.
+
+    A shared totals hash is incremented along with the worker's own, and its
+    HINCRBY result tells the one worker that moved a user between 0 and 1
+    sessions that it owns the online/offline announcement.
+    """
+
+    distributed = True
+
+    def __init__(
+        self,
+        url: str,
+        channel: str = "realtime:emit",
+        presence_key: str = "realtime:presence",
+        presence_ttl: int = None,
+    ):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self.presence_key = presence_key
+        self.presence_ttl = presence_ttl or settings.BACKPLANE_PRESENCE_TTL_SECONDS
+        self._command_conn: RespConnection | None = None
+        self._command_lock = asyncio.Lock()
+        self._subscriber: asyncio.Task | None = None
+        self._heartbeat: asyncio.Task | None = None
+        self._on_presence_lost: PresenceLostHandler | None = None
+
+    @property
+    def workers_key(self) -> str:
+        return f"{self.presence_key}:workers"
+
+    def _counts_key(self, worker_id: str) -> str:
+        return f"{self.presence_key}:counts:{worker_id}"
+
+    def _alive_key(self, worker_id: str) -> str:
+        return f"{self.presence_key}:alive:{worker_id}"
+
+    @property
+    def totals_key(self) -> str:
+        return f"{self.presence_key}:totals"
+
+    async def start(self, on_message: MessageHandler, on_presence_lost: PresenceLostHandler = None):
+        self._on_presence_lost = on_presence_lost
+        self._command_conn = await RespConnection.open(self.url)
+        await self._beat()
+        subscribed = asyncio.get_running_loop().create_future()
+        self._subscriber = asyncio.create_task(self._subscribe_loop(on_message, subscribed))
+        await subscribed
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def _beat(self):
+        await self._command("SET", self._alive_key(self.worker_id), "1", "EX", str(self.presence_ttl))
+        await self._command("SADD", self.workers_key, self.worker_id)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.presence_ttl / 3)
+            try:
+                await self._beat()
+                await self._live_workers(prune=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Backplane heartbeat failed: {e}")
+
+    async def _live_workers(self, prune: bool = False) -> list[str]:
+        workers = [w.decode() for w in await self._command("SMEMBERS", self.workers_key)]
+        if not workers:
+            return []
+        alive = await self._command("MGET", *[self._alive_key(w) for w in workers])
+        live = [w for w, flag in zip(workers, alive) if flag is not None]
+        if prune:
+            for worker_id in set(workers) - set(live):
+                offline = await self._drop_worker(worker_id)
+                if offline is None:
+                    continue
+                logger.info(f"Dropped presence of backplane worker {worker_id}: heartbeat expired")
+                if offline and self._on_presence_lost is not None:
+                    self._on_presence_lost(offline)
+        return live
+
+    async def _drop_worker(self, worker_id: str) -> list[int] | None:
+        """Take a worker's sessions out of the totals; returns the users left with none
+
+        Only the worker whose SREM removed the entry does this, so concurrent
+        heartbeats never subtract the same sessions twice. None if another
+        worker already did.
+        """
+        if not await self._command("SREM", self.workers_key, worker_id):
+            return None
+        key = self._counts_key(worker_id)
+        fields = await self._command("HGETALL", key)
+        offline = []
+        for field, value in zip(fields[::2], fields[1::2]):
+            if int(value) > 0 and await self._command("HINCRBY", self.totals_key, field, str(-int(value))) <= 0:
+                offline.append(int(field))
+        await self._command("DEL", key, self._alive_key(worker_id))
+        return offline
+
+    async def _subscribe_loop(self, on_message: MessageHandler, subscribed: asyncio.Future):
+        delay = 0.1
+        while True:
+            try:
+                conn = await RespConnection.open(self.url)
+                await conn.send("SUBSCRIBE", self.channel)
+                await conn.read_reply()
+                if not subscribed.done():
+                    subscribed.set_result(True)
+                delay = 0.1
+                while True:
+                    reply = await conn.read_reply()
+                    if not isinstance(reply, list) or len(reply) != 3 or reply[0] != b"message":
+                        continue
+                    message = json.loads(reply[2])
+                    if message.get("origin") == self.worker_id:
+                        continue
+                    try:
+                        await on_message(message)
+                    except Exception as e:
+                        logger.warning(f"Backplane delivery failed: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not subscribed.done():
+                    subscribed.set_exception(e)
+                    return
+                logger.warning(f"Backplane subscription lost, reconnecting: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5)
+
+    async def _command(self, *args):
+        async with self._command_lock:
+            if self._command_conn is None or self._command_conn.closed:
+                self._command_conn = await RespConnection.open(self.url)
+            await self._command_conn.send(*args)
+            return await self._command_conn.read_reply()
+
+    async def publish(self, message: dict):
+        message = {**message, "origin": self.worker_id}
+        await self._command("PUBLISH", self.channel, json.dumps(message, default=str))
+
+    async def incr_presence(self, user_id: int, amount: int) -> int:
+        key = self._counts_key(self.worker_id)
+        count = await self._command("HINCRBY", key, str(user_id), str(amount))
+        if count <= 0:
+            await self._command("HDEL", key, str(user_id))
+        if count < 0:
+            # Another worker dropped our hash (missed heartbeats) and already subtracted this session
+            total = await self._command("HGET", self.totals_key, str(user_id))
+            return int(total or 0)
+        # Zeroed totals are left in place: an HDEL could race another worker's increment
+        return await self._command("HINCRBY", self.totals_key, str(user_id), str(amount))
+
+    async def get_presence(self, user_ids: Iterable[int]) -> dict[int, int]:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        counts = dict.fromkeys(user_ids, 0)
+        fields = [str(uid) for uid in user_ids]
+        for worker_id in await self._live_workers():
+            values = await self._command("HMGET", self._counts_key(worker_id), *fields)
+            for uid, value in zip(user_ids, values):
+                if value is not None:
+                    counts[uid] += int(value)
+        return counts
+
+    async def close(self):
+        if self._subscriber is not None:
+            self._subscriber.cancel()
+            try:
+                await self._subscriber
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._subscriber = None
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat = None
+        # Give back the sessions this worker was still counting; a drain is not users going offline
+        try:
+            await self._drop_worker(self.worker_id)
+        except Exception as e:
+            logger.warning(f"Failed to remove backplane presence of {self.worker_id}: {e}")
+        if self._command_conn is not None:
+            self._command_conn.close()
+            self._command_conn = None
+
+
+class RespConnection:
+    """Minimal RESP2 client connection"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, url: str) -> "RespConnection":
+        parsed = urlparse(url)
+        if parsed.scheme == "unix":
+            reader, writer = await asyncio.open_unix_connection(parsed.path)
+        else:
+            reader, writer = await asyncio.open_connection(parsed.hostname or "localhost", parsed.port or 6379)
+        conn = cls(reader, writer)
+        db = (parsed.path or "/").lstrip("/")
+        if parsed.scheme != "unix" and db and db != "0":
+            await conn.send("SELECT", db)
+            await conn.read_reply()
+        return conn
+
+    @property
+    def closed(self) -> bool:
+        return self.writer.is_closing()
+
+    async def send(self, *args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        self.writer.write(b"".join(parts))
+        await self.writer.drain()
+
+    async def read_reply(self):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Backplane connection closed")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise RuntimeError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(body)
+            if length < 0:
+                return None
+            return [await self.read_reply() for _ in range(length)]
+        raise RuntimeError(f"Unexpected RESP reply: {line!r}")
+
+    def close(self):
+        self.writer.close()
+
+
+def create_backplane(url: str | None) -> Backplane:
+    """Build the backplane configured by BACKPLANE_URL"""
+    if not url or url.startswith("memory://"):
+        return InProcessBackplane()
+    if url.startswith(("redis://", "unix://")):
+        return RespBackplane(url)
+    raise ValueError(f"Unsupported BACKPLANE_URL: {url}")
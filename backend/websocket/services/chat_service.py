@@ -1,8 +1,10 @@
 from datetime import datetime
 from sqlalchemy.orm import Session, selectinload
-from sqlalchemy import and_, or_, func
-from database.models import Conversation, Message, User, message_reads
-from database.session import SessionLocal
+from sqlalchemy import and_, or_, func, select, literal
+from core.config import settings
+from database.models import Conversation, Message, User, message_reads, ArchivedMessage
+from database.models.conversation import conversation_participants
+from database.session import ChatSessionLocal
 
 class ChatService:
     """Business logic for chat operations"""
@@ -10,7 +12,12 @@ class ChatService:
     @staticmethod
     def create_conversation(user_ids: list[int], name: str = None, created_by_id: int = None, description: str = None) -> Conversation:
         """Create a new conversation"""
-        db = SessionLocal()
+        if len(set(user_ids)) > settings.MAX_CONVERSATION_MEMBERS:
+            raise ValueError(
+                f"Conversations are limited to {settings.MAX_CONVERSATION_MEMBERS} members"
+            )
+
+        db = ChatSessionLocal()
         try:
             participants = db.query(User).filter(User.id.in_(user_ids)).all()
 
@@ -29,7 +36,8 @@ class ChatService:
 
             # Reload with eager loading of participants before returning
             conversation = db.query(Conversation).options(
-                selectinload(Conversation.participants)
+                selectinload(Conversation.participants),
+                selectinload(Conversation.messages)
             ).filter(Conversation.id == conversation.id).first()
 
             return conversation
@@ -39,7 +47,7 @@ class ChatService:
     @staticmethod
     def get_conversation(conversation_id: int) -> Conversation | None:
         """Get conversation by ID"""
-        db = SessionLocal()
+        db = ChatSessionLocal()
         try:
             return db.query(Conversation).options(
                 selectinload(Conversation.participants)
@@ -52,10 +60,106 @@ class ChatService:
         finally:
             db.close()
 
+    @staticmethod
+    def get_participant_ids(conversation_id: int) -> list[int]:
+        """Get the ids of every participant without loading the User rows"""
+        db = ChatSessionLocal()
+        try:
+            rows = db.execute(
+                select(conversation_participants.c.user_id).where(
+                    conversation_participants.c.conversation_id == conversation_id
+                )
+            ).all()
+            return [row[0] for row in rows]
+        finally:
+            db.close()
+
+    @staticmethod
+    def is_participant(conversation_id: int, user_id: int) -> bool:
+        """Check membership with a single primary key lookup"""
+        db = ChatSessionLocal()
+        try:
+            row = db.execute(
+                select(conversation_participants.c.user_id).where(
+                    and_(
+                        conversation_participants.c.conversation_id == conversation_id,
+                        conversation_participants.c.user_id == user_id,
+                    )
+                )
+            ).first()
+            return row is not None
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_participant_counts(conversation_ids: list[int]) -> dict[int, int]:
+        """Get the number of participants for each conversation"""
+        if not conversation_ids:
+            return {}
+        db = ChatSessionLocal()
+        try:
+            rows = db.execute(
+                select(
+                    conversation_participants.c.conversation_id,
+                    func.count(conversation_participants.c.user_id),
+                ).where(
+                    conversation_participants.c.conversation_id.in_(conversation_ids)
+                ).group_by(conversation_participants.c.conversation_id)
+            ).all()
+            return {conversation_id: count for conversation_id, count in rows}
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_participant_previews(conversation_ids: list[int], limit: int = None) -> dict[int, list[User]]:
+        """Get the first `limit` participants (by user id) of each conversation in one query"""
+        if not conversation_ids:
+            return {}
+        limit = limit or settings.CONVERSATION_PREVIEW_MEMBERS
+        db = ChatSessionLocal()
+        try:
+            ranked = select(
+                conversation_participants.c.conversation_id,
+                conversation_participants.c.user_id,
+                func.row_number().over(
+                    partition_by=conversation_participants.c.conversation_id,
+                    order_by=conversation_participants.c.user_id,
+                ).label("position"),
+            ).where(
+                conversation_participants.c.conversation_id.in_(conversation_ids)
+            ).subquery()
+
+            rows = db.query(ranked.c.conversation_id, User).join(
+                User, User.id == ranked.c.user_id
+            ).filter(
+                ranked.c.position <= limit
+            ).order_by(ranked.c.conversation_id, User.id).all()
+
+            previews: dict[int, list[User]] = {conversation_id: [] for conversation_id in conversation_ids}
+            for conversation_id, user in rows:
+                previews[conversation_id].append(user)
+            return previews
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_members(conversation_id: int, limit: int = 50, offset: int = 0) -> list[User]:
+        """Get a page of conversation members ordered by user id"""
+        db = ChatSessionLocal()
+        try:
+            return db.query(User).join(
+                conversation_participants,
+                conversation_participants.c.user_id == User.id,
+            ).filter(
+                conversation_participants.c.conversation_id == conversation_id
+            ).order_by(User.id).limit(limit).offset(offset).all()
+        finally:
+            db.close()
+
     @staticmethod
     def get_user_conversations(user_id: int, limit: int = 50, offset: int = 0):
         """Get all conversations for a user"""
-        db = SessionLocal()
+        db = ChatSessionLocal()
         try:
             conversations = db.query(Conversation).options(
                 selectinload(Conversation.participants),
@@ -78,7 +182,7 @@ class ChatService:
     @staticmethod
     def search_conversations(user_id: int, query: str, limit: int = 20) -> list:
         """Search conversations by name"""
-        db = SessionLocal()
+        db = ChatSessionLocal()
         try:
             search_query = f"%{query}%"
             conversations = db.query(Conversation).options(
@@ -103,10 +207,12 @@ class ChatService:
     @staticmethod
     def update_conversation(conversation_id: int, name: str = None, description: str = None, avatar_url: str = None) -> Conversation | None:
         """Update conversation details"""
-        db = SessionLocal()
+        db = ChatSessionLocal()
         try:
             conversation = db.query(Conversation).options(
-                selectinload(Conversation.participants)
+                selectinload(Conversation.participants),
+                selectinload(Conversation.messages).selectinload(Message.sender),
+                selectinload(Conversation.messages).selectinload(Message.read_by)
             ).filter(Conversation.id == conversation_id).first()
             if conversation:
                 if name:
@@ -125,7 +231,7 @@ class ChatService:
     @staticmethod
     def delete_conversation(conversation_id: int):
         """Soft delete a conversation"""
-        db = SessionLocal()
+        db = ChatSessionLocal()
         try:
             conversation = db.query(Conversation).options(
                 selectinload(Conversation.participants)
@@ -133,6 +239,7 @@ class ChatService:
             if conversation:
                 conversation.deleted_at = datetime.utcnow()
                 db.commit()
+                db.refresh(conversation)
             return conversation
         finally:
             db.close()
@@ -146,7 +253,7 @@ class ChatService:
         media_url: str = None
     ) -> Message:
         """Create a new message"""
-        db = SessionLocal()
+        db = ChatSessionLocal()
         try:
             message = Message(
                 conversation_id=conversation_id,
@@ -176,10 +283,63 @@ class ChatService:
         finally:
             db.close()
 
+    @staticmethod
+    def insert_messages(requests: list[dict]) -> list[int]:
+        """Insert a batch of messages in a single transaction
+
+        Each request holds the keyword arguments of create_message. Returns
+        the new ids in request order; if this raises, nothing was committed.
+        Load the messages with load_messages.
+        """
+        db = ChatSessionLocal()
+        try:
+            messages = [
+                Message(
+                    conversation_id=req["conversation_id"],
+                    sender_id=req["sender_id"],
+                    content=req["content"],
+                    content_type=req.get("content_type") or "text",
+                    media_url=req.get("media_url"),
+                )
+                for req in requests
+            ]
+            db.add_all(messages)
+
+            conversation_ids = {req["conversation_id"] for req in requests}
+            db.query(Conversation).filter(
+                Conversation.id.in_(conversation_ids)
+            ).update({Conversation.updated_at: datetime.utcnow()}, synchronize_session=False)
+
+            # Read the ids before committing: afterwards they would be reloaded, which can fail
+            db.flush()
+            ids = [m.id for m in messages]
+            db.commit()
+            return ids
+        finally:
+            db.close()
+
+    @staticmethod
+    def load_messages(ids: list[int]) -> list[Message]:
+        """Messages by id with sender and read receipts loaded, in the order given"""
+        db = ChatSessionLocal()
+        try:
+            loaded = db.query(Message).options(
+                selectinload(Message.sender),
+                selectinload(Message.read_by)
+            ).filter(Message.id.in_(ids)).all()
+            by_id = {m.id: m for m in loaded}
+            return [by_id[message_id] for message_id in ids]
+        finally:
+            db.close()
+
     @staticmethod
     def get_messages(conversation_id: int, limit: int = 50, offset: int = 0):
-        """Get messages from a conversation"""
-        db = SessionLocal()
+        """Get messages from a conversation
+
+        Every archived message is older than every hot one, so a page that runs
+        past the end of the hot table continues into the archive.
+        """
+        db = ChatSessionLocal()
         try:
             messages = db.query(Message).options(
                 selectinload(Message.sender),
@@ -192,14 +352,34 @@ class ChatService:
             ).order_by(
                 Message.created_at.desc()
             ).limit(limit).offset(offset).all()
+
+            if len(messages) < limit:
+                hot_total = db.query(func.count(Message.id)).filter(
+                    and_(
+                        Message.conversation_id == conversation_id,
+                        Message.is_deleted == False
+                    )
+                ).scalar() or 0
+                messages += db.query(ArchivedMessage).options(
+                    selectinload(ArchivedMessage.sender),
+                    selectinload(ArchivedMessage.read_by)
+                ).filter(
+                    and_(
+                        ArchivedMessage.conversation_id == conversation_id,
+                        ArchivedMessage.is_deleted == False
+                    )
+                ).order_by(
+                    ArchivedMessage.created_at.desc()
+                ).limit(limit - len(messages)).offset(max(0, offset - hot_total)).all()
+
             return list(reversed(messages))
         finally:
             db.close()
 
     @staticmethod
     def search_messages(conversation_id: int, query: str, limit: int = 20) -> list:
-        """Search messages in a conversation"""
-        db = SessionLocal()
+        """Search messages in a conversation, falling through to the archive"""
+        db = ChatSessionLocal()
         try:
             search_query = f"%{query}%"
             messages = db.query(Message).options(
@@ -214,6 +394,21 @@ class ChatService:
             ).order_by(
                 Message.created_at.desc()
             ).limit(limit).all()
+
+            if len(messages) < limit:
+                messages += db.query(ArchivedMessage).options(
+                    selectinload(ArchivedMessage.sender),
+                    selectinload(ArchivedMessage.read_by)
+                ).filter(
+                    and_(
+                        ArchivedMessage.conversation_id == conversation_id,
+                        ArchivedMessage.is_deleted == False,
+                        ArchivedMessage.content.ilike(search_query)
+                    )
+                ).order_by(
+                    ArchivedMessage.created_at.desc()
+                ).limit(limit - len(messages)).all()
+
             return list(reversed(messages))
         finally:
             db.close()
@@ -221,7 +416,7 @@ class ChatService:
     @staticmethod
     def mark_message_as_read(message_id: int, user_id: int):
         """Mark a message as read by a user"""
-        db = SessionLocal()
+        db = ChatSessionLocal()
         try:
             message = db.query(Message).options(
                 selectinload(Message.read_by)
@@ -243,10 +438,44 @@ class ChatService:
         finally:
             db.close()
 
+    @staticmethod
+    def mark_read_up_to(conversation_id: int, user_id: int, message_id: int) -> int:
+        """Mark every message up to message_id in a conversation as read, in one statement"""
+        db = ChatSessionLocal()
+        try:
+            already_read = select(message_reads.c.message_id).where(
+                and_(message_reads.c.message_id == Message.id, message_reads.c.user_id == user_id)
+            ).exists()
+            is_participant = select(conversation_participants.c.user_id).where(
+                and_(
+                    conversation_participants.c.conversation_id == conversation_id,
+                    conversation_participants.c.user_id == user_id,
+                )
+            ).exists()
+            unread = select(Message.id, literal(user_id), literal(datetime.utcnow())).where(
+                and_(
+                    Message.conversation_id == conversation_id,
+                    Message.id <= message_id,
+                    Message.sender_id != user_id,
+                    Message.is_deleted == False,
+                    ~already_read,
+                    is_participant,
+                )
+            )
+            result = db.execute(
+                message_reads.insert()
+                .from_select(["message_id", "user_id", "read_at"], unread)
+                .prefix_with("OR IGNORE", dialect="sqlite")
+            )
+            db.commit()
+            return result.rowcount
+        finally:
+            db.close()
+
     @staticmethod
     def mark_conversation_messages_as_read(conversation_id: int, user_id: int):
         """Mark all messages in a conversation as read by a user"""
-        db = SessionLocal()
+        db = ChatSessionLocal()
         try:
             messages = db.query(Message).filter(
                 and_(
@@ -267,7 +496,7 @@ class ChatService:
     @staticmethod
     def get_unread_count(conversation_id: int, user_id: int) -> int:
         """Get count of unread messages in a conversation for a user"""
-        db = SessionLocal()
+        db = ChatSessionLocal()
         try:
             # Count messages not read by this user
             unread = db.query(func.count(Message.id)).filter(
@@ -282,10 +511,49 @@ class ChatService:
         finally:
             db.close()
 
+    @staticmethod
+    def get_unread_counts(conversation_id: int, user_ids: list[int]) -> dict[int, int]:
+        """Get unread message counts in a conversation for several users in one query"""
+        if not user_ids:
+            return {}
+        db = ChatSessionLocal()
+        try:
+            unread_read = message_reads.alias("unread_read")
+            rows = db.execute(
+                select(
+                    conversation_participants.c.user_id,
+                    func.count(Message.id),
+                ).select_from(conversation_participants).join(
+                    Message,
+                    and_(
+                        Message.conversation_id == conversation_participants.c.conversation_id,
+                        Message.sender_id != conversation_participants.c.user_id,
+                        Message.is_deleted == False,
+                    ),
+                ).outerjoin(
+                    unread_read,
+                    and_(
+                        unread_read.c.message_id == Message.id,
+                        unread_read.c.user_id == conversation_participants.c.user_id,
+                    ),
+                ).where(
+                    and_(
+                        conversation_participants.c.conversation_id == conversation_id,
+                        conversation_participants.c.user_id.in_(user_ids),
+                        unread_read.c.message_id == None,
+                    )
+                ).group_by(conversation_participants.c.user_id)
+            ).all()
+            counts = {user_id: 0 for user_id in user_ids}
+            counts.update({user_id: count for user_id, count in rows})
+            return counts
+        finally:
+            db.close()
+
     @staticmethod
     def delete_message(message_id: int):
         """Soft delete a message"""
-        db = SessionLocal()
+        db = ChatSessionLocal()
         try:
             message = db.query(Message).options(
                 selectinload(Message.sender),
@@ -301,7 +569,7 @@ class ChatService:
     @staticmethod
     def edit_message(message_id: int, content: str):
         """Edit a message"""
-        db = SessionLocal()
+        db = ChatSessionLocal()
         try:
             message = db.query(Message).options(
                 selectinload(Message.sender),
@@ -325,7 +593,7 @@ class ChatService:
     @staticmethod
     def get_or_create_dm_conversation(user_id_1: int, user_id_2: int) -> Conversation:
         """Get or create a direct message conversation between two users"""
-        db = SessionLocal()
+        db = ChatSessionLocal()
         conversation = None
         try:
             from sqlalchemy.orm import selectinload
@@ -1,58 +1,266 @@
-from typing import Dict, Set
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Set, Iterable, Sequence, Tuple
+from core.config import settings
+from websocket.services.backplane import Backplane, InProcessBackplane
+
+logger = logging.getLogger(__name__)
+
+class SessionRecord:
+    """Registry entry of one session: its user and its index in that user's session list"""
+
+    __slots__ = ("user_id", "slot")
+
+    def __init__(self, user_id: int, slot: int):
+        self.user_id = user_id
+        self.slot = slot
+
 
 class ConnectionService:
-    """Manages WebSocket connections for users"""
-    
-    def __init__(self):
-        self.active_connections: Dict[int, Set[str]] = {}
-        self.user_by_session: Dict[str, int] = {}
-        self.typing_users: Dict[int, Set[int]] = {}  # conversation_id -> set of user_ids
-    
-    async def connect(self, user_id: int, session_id: str):
-        """Register a new connection"""
-        if user_id not in self.active_connections:
-            self.active_connections[user_id] = set()
-        self.active_connections[user_id].add(session_id)
-        self.user_by_session[session_id] = user_id
-    
-    async def disconnect(self, session_id: str):
-        """Remove a disconnected session"""
-        user_id = self.user_by_session.get(session_id)
-        if user_id and session_id in self.active_connections.get(user_id, set()):
-            self.active_connections[user_id].remove(session_id)
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-        if session_id in self.user_by_session:
-            del self.user_by_session[session_id]
+    """Manages WebSocket connections for users
+
+    Sessions are kept in a dict of slotted records plus one list of session
+    ids per user (most users have a single session, and a one-item list is a
+    fraction of the size of a set). The record remembers its list index, so
+    a disconnect swaps the user's last session into the freed slot: connect
+    and disconnect are O(1) and lookups hand out the list without copying.
+    """
+    
+    def __init__(self, backplane: Backplane = None):
+        self.active_connections: Dict[int, List[str]] = {}
+        self.sessions: Dict[str, SessionRecord] = {}
+        # conversation_id -> {user_id: (expires_at, user_name)}
+        self.typing_users: Dict[int, Dict[int, Tuple[float, str]]] = {}
+        self.typing_last_start: Dict[Tuple[int, int], float] = {}  # (conversation_id, user_id) -> last broadcast start
+        self.typing_stats: Dict[str, int] = {
+            "start_suppressed": 0,
+            "stop_suppressed": 0,
+            "expired": 0,
+            "cleared_on_disconnect": 0,
+        }
+        self.last_seen: Dict[int, datetime] = {}
+        self.presence_dirty: Set[int] = set()  # users whose presence changed since the last snapshot
+        self.restored_until: Dict[int, float] = {}  # users restored from a snapshot -> end of reconnect grace
+        self.backplane = backplane or InProcessBackplane()
+    
+    async def connect(self, user_id: int, session_id: str) -> bool:
+        """Register a new connection; True if it brought the user online on every worker
+
+        A user restored from a snapshot was never announced offline, so their
+        reconnect does not count as coming online.
+        """
+        was_online = self.is_user_online(user_id)
+        if not self._register(user_id, session_id):
+            return False
+        self.restored_until.pop(user_id, None)
+        self._touch(user_id)
+        total = await self._update_presence(user_id, 1)
+        return not was_online and (total is None or total == 1)
+    
+    async def disconnect(self, session_id: str) -> bool:
+        """Remove a disconnected session; True if it was the user's last one on every worker"""
+        user_id = self._unregister(session_id)
+        if user_id is None:
+            return False
+        self._touch(user_id)
+        total = await self._update_presence(user_id, -1)
+        return not self.is_user_online(user_id) and (total is None or total <= 0)
+
+    def _register(self, user_id: int, session_id: str) -> bool:
+        if session_id in self.sessions:
+            return False
+        session_ids = self.active_connections.get(user_id)
+        if session_ids is None:
+            # A literal one-item list is allocated exactly; append would over-allocate
+            self.active_connections[user_id] = [session_id]
+            self.sessions[session_id] = SessionRecord(user_id, 0)
+        else:
+            self.sessions[session_id] = SessionRecord(user_id, len(session_ids))
+            session_ids.append(session_id)
+        return True
+
+    def _unregister(self, session_id: str) -> int | None:
+        record = self.sessions.pop(session_id, None)
+        if record is None:
+            return None
+        session_ids = self.active_connections[record.user_id]
+        last = session_ids.pop()
+        if last != session_id:
+            session_ids[record.slot] = last
+            self.sessions[last].slot = record.slot
+        if not session_ids:
+            del self.active_connections[record.user_id]
+        return record.user_id
+
+    def get_user_id(self, session_id: str) -> int | None:
+        """User of a local session, or None if it isn't registered"""
+        record = self.sessions.get(session_id)
+        return record.user_id if record is not None else None
+
+    def _touch(self, user_id: int):
+        self.last_seen[user_id] = datetime.utcnow()
+        self.presence_dirty.add(user_id)
+
+    def restore_presence(self, user_ids: Iterable[int], grace_seconds: float):
+        """Keep users from a previous process online while they reconnect"""
+        until = time.monotonic() + grace_seconds
+        for user_id in user_ids:
+            if user_id not in self.active_connections:
+                self.restored_until[user_id] = until
+
+    def expire_restored(self, now: float = None) -> list[int]:
+        """End the reconnect grace of restored users who did not come back"""
+        now = time.monotonic() if now is None else now
+        expired = [uid for uid, until in self.restored_until.items() if until <= now]
+        for user_id in expired:
+            del self.restored_until[user_id]
+            self.presence_dirty.add(user_id)
+        return expired
+
+    async def _update_presence(self, user_id: int, amount: int) -> int | None:
+        """Share session counts with other workers; a backplane outage never blocks connects
+
+        Returns the user's count across all workers, or None to decide from
+        this worker's sessions alone.
+        """
+        try:
+            return await self.backplane.incr_presence(user_id, amount)
+        except Exception as e:
+            logger.warning(f"Failed to update presence for user {user_id}: {e}")
+            return None
+
+    async def get_online_user_ids(self, user_ids: Iterable[int]) -> set[int]:
+        """Get which of the given users are connected to any worker"""
+        user_ids = list(user_ids)
+        online = {uid for uid in user_ids if self.is_user_online(uid)}
+        if not self.backplane.distributed:
+            return online
+        try:
+            counts = await self.backplane.get_presence([uid for uid in user_ids if uid not in online])
+        except Exception as e:
+            logger.warning(f"Failed to read presence from backplane: {e}")
+            return online
+        return online | {uid for uid, count in counts.items() if count > 0}
     
+    @staticmethod
+    def user_room(user_id: int) -> str:
+        """Socket.IO room joined by every session of a user"""
+        return f"user_{user_id}"
+
     def is_user_online(self, user_id: int) -> bool:
-        """Check if user has active connections"""
-        return user_id in self.active_connections and len(self.active_connections[user_id]) > 0
+        """Check if user has active connections, or is still within a post-restart reconnect grace"""
+        if user_id in self.active_connections:
+            return True
+        until = self.restored_until.get(user_id)
+        return until is not None and until > time.monotonic()
     
-    def get_user_sessions(self, user_id: int) -> list[str]:
-        """Get all session IDs for a user"""
-        return list(self.active_connections.get(user_id, set()))
+    def get_user_sessions(self, user_id: int) -> Sequence[str]:
+        """Get all session IDs for a user
+
+        Returns the registry's own list: don't modify it, and copy it before
+        awaiting in the middle of iterating over it.
+        """
+        return self.active_connections.get(user_id, ())
     
     def get_online_users(self) -> Dict[int, int]:
         """Get count of active connections per user"""
         return {uid: len(sids) for uid, sids in self.active_connections.items()}
+
+    def get_connection_counts(self) -> Dict[str, int]:
+        """Connected users and sessions on this worker"""
+        return {"users": len(self.active_connections), "sessions": len(self.sessions)}
     
+    def start_typing(self, conversation_id: int, user_id: int, user_name: str = "", now: float = None) -> bool:
+        """Refresh a user's typing state; returns whether a typing_start should be broadcast"""
+        now = time.monotonic() if now is None else now
+        typing = self.typing_users.setdefault(conversation_id, {})
+        was_typing = user_id in typing
+        typing[user_id] = (now + settings.TYPING_TTL_SECONDS, user_name)
+
+        key = (conversation_id, user_id)
+        last_start = self.typing_last_start.get(key)
+        if was_typing and last_start is not None and now - last_start < settings.TYPING_THROTTLE_SECONDS:
+            self.typing_stats["start_suppressed"] += 1
+            return False
+        self.typing_last_start[key] = now
+        return True
+
+    def stop_typing(self, conversation_id: int, user_id: int) -> bool:
+        """Drop a user's typing state; returns whether a typing_stop should be broadcast"""
+        typing = self.typing_users.get(conversation_id)
+        if not typing or user_id not in typing:
+            self.typing_stats["stop_suppressed"] += 1
+            return False
+        self._remove_typing(conversation_id, user_id)
+        return True
+
+    def expire_typing(self, now: float = None) -> list[Tuple[int, int, str]]:
+        """Drop typing states past their TTL; returns (conversation_id, user_id, user_name) for each"""
+        now = time.monotonic() if now is None else now
+        expired = [
+            (conversation_id, user_id, user_name)
+            for conversation_id, typing in self.typing_users.items()
+            for user_id, (expires_at, user_name) in typing.items()
+            if expires_at <= now
+        ]
+        for conversation_id, user_id, _ in expired:
+            self._remove_typing(conversation_id, user_id)
+        self.typing_stats["expired"] += len(expired)
+        return expired
+
+    def clear_user_typing(self, user_id: int) -> list[Tuple[int, int, str]]:
+        """Drop every typing state of a user, e.g. once their last session is gone"""
+        cleared = [
+            (conversation_id, user_id, typing[user_id][1])
+            for conversation_id, typing in self.typing_users.items()
+            if user_id in typing
+        ]
+        for conversation_id, _, _ in cleared:
+            self._remove_typing(conversation_id, user_id)
+        self.typing_stats["cleared_on_disconnect"] += len(cleared)
+        return cleared
+
+    def _remove_typing(self, conversation_id: int, user_id: int):
+        typing = self.typing_users.get(conversation_id, {})
+        typing.pop(user_id, None)
+        if not typing:
+            self.typing_users.pop(conversation_id, None)
+        self.typing_last_start.pop((conversation_id, user_id), None)
+
+    def export_typing(self) -> Dict[int, list[dict]]:
+        """Typing states per user with wall-clock expiry, for snapshots"""
+        offset = time.time() - time.monotonic()
+        exported: Dict[int, list[dict]] = {}
+        for conversation_id, typing in self.typing_users.items():
+            for user_id, (expires_at, user_name) in typing.items():
+                exported.setdefault(user_id, []).append({
+                    "conversation_id": conversation_id,
+                    "user_name": user_name,
+                    "expires_at": expires_at + offset,
+                })
+        return exported
+
+    def import_typing(self, user_id: int, entries: list[dict]):
+        """Restore snapshotted typing states that have not expired yet"""
+        offset = time.time() - time.monotonic()
+        for entry in entries or []:
+            expires_at = entry["expires_at"] - offset
+            if expires_at > time.monotonic():
+                typing = self.typing_users.setdefault(entry["conversation_id"], {})
+                typing[user_id] = (expires_at, entry.get("user_name", ""))
+
     def add_typing_user(self, conversation_id: int, user_id: int):
         """Add user to typing list for a conversation"""
-        if conversation_id not in self.typing_users:
-            self.typing_users[conversation_id] = set()
-        self.typing_users[conversation_id].add(user_id)
+        self.start_typing(conversation_id, user_id)
     
     def remove_typing_user(self, conversation_id: int, user_id: int):
         """Remove user from typing list"""
-        if conversation_id in self.typing_users:
-            self.typing_users[conversation_id].discard(user_id)
-            if not self.typing_users[conversation_id]:
-                del self.typing_users[conversation_id]
+        self.stop_typing(conversation_id, user_id)
     
     def get_typing_users(self, conversation_id: int) -> list[int]:
         """Get users typing in a conversation"""
-        return list(self.typing_users.get(conversation_id, set()))
+        return list(self.typing_users.get(conversation_id, {}))
 
 # Global connection service instance
 connection_service = ConnectionService()
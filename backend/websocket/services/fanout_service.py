@@ -0,0 +1,139 @@
+import asyncio
+import logging
+from typing import Iterable
+from core.config import settings
+from websocket.services.connection_service import ConnectionService
+from websocket.services.outbound_queue import OutboundQueues
+from websocket.services.metrics import realtime_metrics
+from websocket.services.notification_streams import NotificationStreams, STREAMED_EVENTS
+
+logger = logging.getLogger(__name__)
+
+class FanoutService:
+    """Delivers an event to every session of a set of users in bounded chunks"""
+
+    def __init__(
+        self,
+        sio,
+        connection_service: ConnectionService,
+        chunk_size: int = None,
+        outbound: OutboundQueues = None,
+        streams: NotificationStreams = None,
+    ):
+        self.sio = sio
+        self.connection_service = connection_service
+        self.chunk_size = chunk_size or settings.FANOUT_CHUNK_SIZE
+        self.outbound = outbound or OutboundQueues(sio)
+        self.streams = streams
+
+    def collect_sessions(
+        self,
+        user_ids: Iterable[int],
+        exclude_sid: str = None,
+        exclude_user_id: int = None,
+    ) -> list[str]:
+        """Resolve the online sessions of the given users"""
+        sessions = []
+        for user_id in user_ids:
+            if user_id == exclude_user_id:
+                continue
+            for sid in self.connection_service.get_user_sessions(user_id):
+                if sid != exclude_sid:
+                    sessions.append(sid)
+        return sessions
+
+    async def emit_to_sessions(self, event: str, payload: dict, sessions: list[str]) -> int:
+        """Queue an event on each session's outbound queue, yielding to the event loop between chunks"""
+        realtime_metrics.record_fanout(len(sessions))
+        for start in range(0, len(sessions), self.chunk_size):
+            for sid in sessions[start:start + self.chunk_size]:
+                self.outbound.enqueue(sid, event, payload)
+            # Let other handlers run before the next chunk of a large group
+            await asyncio.sleep(0)
+        return len(sessions)
+
+    async def emit_to_session(self, event: str, payload: dict, sid: str) -> int:
+        """Queue an event for one session, ordered after everything already queued for it"""
+        return await self.emit_to_sessions(event, payload, [sid])
+
+    @property
+    def backplane(self):
+        return self.connection_service.backplane
+
+    async def _publish(self, message: dict):
+        """Hand an emit to the other workers; local delivery has already happened"""
+        if not self.backplane.distributed:
+            return
+        try:
+            await self.backplane.publish(message)
+        except Exception as e:
+            logger.warning(f"Failed to publish {message.get('event')} to backplane: {e}")
+
+    async def emit_to_users(
+        self,
+        event: str,
+        payload: dict,
+        user_ids: Iterable[int],
+        exclude_sid: str = None,
+        exclude_user_id: int = None,
+    ) -> int:
+        """Emit an event to every online session of the given users, on every worker"""
+        user_ids = list(user_ids)
+        delivered = await self._deliver_to_users(event, payload, user_ids, exclude_sid, exclude_user_id)
+        await self._publish({
+            "type": "users",
+            "event": event,
+            "data": payload,
+            "user_ids": user_ids,
+            "exclude_sid": exclude_sid,
+            "exclude_user_id": exclude_user_id,
+        })
+        return delivered
+
+    async def _deliver_to_users(self, event, payload, user_ids, exclude_sid=None, exclude_user_id=None) -> int:
+        if self.streams is not None and event in STREAMED_EVENTS:
+            for user_id in user_ids:
+                if user_id != exclude_user_id:
+                    self.streams.publish(user_id, event, payload)
+        sessions = self.collect_sessions(user_ids, exclude_sid=exclude_sid, exclude_user_id=exclude_user_id)
+        return await self.emit_to_sessions(event, payload, sessions)
+
+    async def emit_to_user_rooms(self, event: str, payloads: dict[int, dict]) -> int:
+        """Emit a per-user payload to the room of each online user, on every worker"""
+        delivered = await self._deliver_to_user_rooms(event, payloads)
+        await self._publish({
+            "type": "rooms",
+            "event": event,
+            "payloads": {str(uid): payload for uid, payload in payloads.items()},
+        })
+        return delivered
+
+    async def handle_remote(self, message: dict):
+        """Deliver an emit published by another worker to this worker's sessions"""
+        if message.get("type") == "users":
+            await self._deliver_to_users(
+                message["event"],
+                message["data"],
+                message["user_ids"],
+                message.get("exclude_sid"),
+                message.get("exclude_user_id"),
+            )
+        elif message.get("type") == "rooms":
+            payloads = {int(uid): payload for uid, payload in message["payloads"].items()}
+            await self._deliver_to_user_rooms(message["event"], payloads)
+
+    async def _deliver_to_user_rooms(self, event: str, payloads: dict[int, dict]) -> int:
+        user_ids = [uid for uid in payloads if self.connection_service.is_user_online(uid)]
+        sessions = 0
+        for start in range(0, len(user_ids), self.chunk_size):
+            for uid in user_ids[start:start + self.chunk_size]:
+                for sid in self.connection_service.get_user_sessions(uid):
+                    self.outbound.enqueue(sid, event, payloads[uid])
+                    sessions += 1
+            await asyncio.sleep(0)
+        realtime_metrics.record_fanout(sessions)
+        return len(user_ids)
+
+    async def emit_to_user(self, event: str, payload: dict, user_id: int) -> int:
+        """Emit an event to every online session of a single user"""
+        return await self.emit_to_users(event, payload, [user_id])
@@ -0,0 +1,134 @@
+import asyncio
+from core.config import settings
+from database.models import Message
+from websocket.services.chat_service import ChatService
+
+class MessageWritePipeline:
+    """Group-commits chat messages
+
+    Messages submitted within MESSAGE_BATCH_MAX_LATENCY_MS of the first one (up
+    to MESSAGE_BATCH_MAX_SIZE) are written in one transaction. Each submitter
+    is resolved only after that transaction has committed.
+    """
+
+    # Reads of a committed batch, e.g. while the database is locked, before its senders get the error
+    LOAD_ATTEMPTS = 3
+
+    def __init__(self, chat_service: ChatService = None, max_batch_size: int = None, max_latency_ms: float = None):
+        self.chat_service = chat_service or ChatService()
+        self.max_batch_size = max_batch_size or settings.MESSAGE_BATCH_MAX_SIZE
+        self.max_latency = (max_latency_ms if max_latency_ms is not None else settings.MESSAGE_BATCH_MAX_LATENCY_MS) / 1000
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        # Taken off the queue but not yet resolved
+        self._batch: list = []
+
+    def _ensure_worker(self):
+        # One queue for the pipeline's lifetime, so a restarted worker picks up what was already queued
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(
+        self,
+        conversation_id: int,
+        sender_id: int,
+        content: str,
+        content_type: str = "text",
+        media_url: str = None,
+    ) -> Message:
+        """Queue a message and wait until the batch containing it is durable"""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(({
+            "conversation_id": conversation_id,
+            "sender_id": sender_id,
+            "content": content,
+            "content_type": content_type,
+            "media_url": media_url,
+        }, future))
+        return await future
+
+    async def _collect_batch(self) -> list:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = self._batch = await self._collect_batch()
+            requests = [request for request, _ in batch]
+            try:
+                # The commit runs off the event loop so sockets keep being served
+                ids = await asyncio.to_thread(self.chat_service.insert_messages, requests)
+            except Exception:
+                # Nothing was committed: fall back to one transaction per message so a bad row only fails its sender
+                results = []
+                for item in batch:
+                    request, _ = item
+                    try:
+                        results.append((item, await asyncio.to_thread(lambda r=request: self.chat_service.create_message(**r))))
+                    except Exception as e:
+                        results.append((item, e))
+            else:
+                # The batch is durable; never insert it again, only retry reading it back
+                results = list(zip(batch, await self._load(ids)))
+
+            for (_, future), result in results:
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            self._batch = []
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _load(self, ids: list[int]) -> list:
+        """Committed messages by id; one exception per message if they can't be read back"""
+        for attempt in range(self.LOAD_ATTEMPTS):
+            try:
+                return await asyncio.to_thread(self.chat_service.load_messages, ids)
+            except Exception as e:
+                error = e
+                if attempt + 1 < self.LOAD_ATTEMPTS:
+                    await asyncio.sleep(0.05 * (attempt + 1))
+        return [error] * len(ids)
+
+    async def close(self):
+        """Write what is still queued, then stop the background writer
+
+        Anything the worker could not write (it had died, or is cancelled while
+        waiting) fails its sender instead of leaving it waiting forever.
+        """
+        if self._worker is not None:
+            if not self._worker.done():
+                await self._queue.join()
+            self._worker.cancel()
+            try:
+                await self._worker
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._worker = None
+        pending = self._batch
+        self._batch = []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+            self._queue.task_done()
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Message pipeline stopped"))
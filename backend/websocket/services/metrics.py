@@ -0,0 +1,125 @@
+import bisect
+import contextvars
+import functools
+import time
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+FANOUT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+# Name of the socket event whose handler is running in the current task
+current_event: contextvars.ContextVar[str | None] = contextvars.ContextVar("current_event", default=None)
+
+class Histogram:
+    """Fixed-bucket histogram; record is a bisect plus two additions"""
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct: float) -> float | None:
+        """Upper bound of the bucket holding the given percentile, capped at the observed max"""
+        if not self.count:
+            return None
+        rank = self.count * pct / 100
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return round(min(self.bounds[index], self.max) if index < len(self.bounds) else self.max, 3)
+        return round(self.max, 3)
+
+    def to_dict(self) -> dict:
+        labels = [f"le_{bound}" for bound in self.bounds] + ["le_inf"]
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "avg": round(self.total / self.count, 3) if self.count else None,
+            "max": round(self.max, 3),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class EventStats:
+    __slots__ = ("count", "errors", "latency")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.latency = Histogram(LATENCY_BUCKETS_MS)
+
+
+class RealtimeMetrics:
+    """Counters and histograms for the socket layer, kept in process memory"""
+
+    def __init__(self):
+        self.events: dict[str, EventStats] = {}
+        self.fanout_sessions = Histogram(FANOUT_BUCKETS)
+        self.emit_latency = Histogram(LATENCY_BUCKETS_MS)
+
+    def _stats(self, event: str) -> EventStats:
+        stats = self.events.get(event)
+        if stats is None:
+            stats = self.events[event] = EventStats()
+        return stats
+
+    def instrument(self, handler):
+        """Decorator recording count, errors and latency of a socket event handler"""
+        event = handler.__name__
+
+        @functools.wraps(handler)
+        async def wrapper(*args):
+            stats = self._stats(event)
+            stats.count += 1
+            token = current_event.set(event)
+            start = time.perf_counter()
+            try:
+                return await handler(*args)
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                stats.latency.record((time.perf_counter() - start) * 1000)
+                current_event.reset(token)
+
+        return wrapper
+
+    def record_error(self):
+        """Count a failure the running handler caught and reported itself"""
+        event = current_event.get()
+        if event is not None:
+            self._stats(event).errors += 1
+
+    def record_fanout(self, sessions: int):
+        self.fanout_sessions.record(sessions)
+
+    def record_emit(self, latency_ms: float):
+        self.emit_latency.record(latency_ms)
+
+    def snapshot(self) -> dict:
+        return {
+            "events": {
+                name: {"count": stats.count, "errors": stats.errors, "latency_ms": stats.latency.to_dict()}
+                for name, stats in sorted(self.events.items())
+            },
+            "fanout_sessions": self.fanout_sessions.to_dict(),
+            "emit_latency_ms": self.emit_latency.to_dict(),
+        }
+
+
+# Global metrics instance shared by the socket handlers and services
+realtime_metrics = RealtimeMetrics()
@@ -4,6 +4,15 @@ from typing import Optional
 class NotificationService:
     """Service for creating standardized notification data"""
     
+    @staticmethod
+    def create_user_card(user) -> dict:
+        """Create the compact identity cached on a socket session"""
+        return {
+            "id": user.id,
+            "name": f"{user.first_name} {user.last_name}".strip(),
+            "avatar": user.profile_photo,
+        }
+    
     @staticmethod
     def create_notification(
         event_type: str,
@@ -59,6 +68,17 @@ class NotificationService:
             "created_at": created_at,
         }
     
+    @staticmethod
+    def create_message_preview(message_payload: dict) -> dict:
+        """Create the compact latest-message preview used in inbox updates"""
+        return {
+            "id": message_payload["id"],
+            "sender_id": message_payload["sender"]["id"],
+            "content": (message_payload.get("content") or "")[:100],
+            "content_type": message_payload.get("content_type"),
+            "created_at": message_payload.get("created_at"),
+        }
+
     @staticmethod
     def create_typing_payload(
         conversation_id: int,
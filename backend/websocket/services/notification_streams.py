@@ -0,0 +1,69 @@
+import asyncio
+from core.config import settings
+from websocket.events import SocketEvents
+
+# Events mirrored to Server-Sent Events subscribers; each carries its notification id
+STREAMED_EVENTS = frozenset({
+    SocketEvents.PROFILE_VISIT,
+    SocketEvents.FRIEND_REQUEST,
+    SocketEvents.FRIEND_REQUEST_ACCEPTED,
+    SocketEvents.POST_COMMENT,
+    SocketEvents.POST_LIKE,
+})
+
+# Queued in place of an event to tell a stream to end; the client resumes with Last-Event-ID
+CLOSE_STREAM = None
+
+class NotificationStreams:
+    """In-process subscribers of the SSE notification stream, one queue per open stream
+
+    Publishing never waits: a stream whose queue is full is closed instead,
+    and its client reconnects and replays what it missed from the
+    notifications table.
+    """
+
+    def __init__(self, queue_size: int = None):
+        self.queue_size = queue_size or settings.SSE_QUEUE_MAX_SIZE
+        self._subscribers: dict[int, set[asyncio.Queue]] = {}
+        self.stats = {"published": 0, "overflowed": 0}
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    def publish(self, user_id: int, event: str, payload: dict):
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.full():
+                self._close(queue)
+                self.stats["overflowed"] += 1
+                continue
+            queue.put_nowait((event, payload))
+            self.stats["published"] += 1
+
+    @staticmethod
+    def _close(queue: asyncio.Queue):
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(CLOSE_STREAM)
+
+    def close_all(self):
+        """End every open stream, e.g. before the server shuts down"""
+        for queues in self._subscribers.values():
+            for queue in queues:
+                self._close(queue)
+
+    def get_metrics(self) -> dict:
+        return {
+            "users": len(self._subscribers),
+            "streams": sum(len(queues) for queues in self._subscribers.values()),
+            **self.stats,
+        }
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from core.config import settings
+from websocket.events import SocketEvents
+from websocket.services.metrics import realtime_metrics
+
+logger = logging.getLogger(__name__)
+
+# Ephemeral events that can be lost without the client ending up in a wrong state
+DROPPABLE_EVENTS = frozenset({SocketEvents.TYPING_START, SocketEvents.TYPING_STOP})
+
+class OutboundQueues:
+    """Bounded per-session outbound queues, each drained by its own task
+
+    Enqueuing never waits on the socket, so one slow client cannot delay the
+    others. A drain task only exists while its session has a backlog, and it
+    holds back while the Engine.IO transport queue of that session is above
+    OUTBOUND_TRANSPORT_HIGH_WATER, so a slow client's backlog builds up here
+    where it is bounded. When a queue is full, typing events are dropped
+    first; if nothing droppable is left the session is disconnected.
+
+    Sessions with batching enabled get one "batch" frame holding an ordered
+    [{event, data}] array per window instead of a frame per event. The first
+    event after a quiet window goes out at once, as a plain event.
+    """
+
+    def __init__(self, sio, max_size: int = None, transport_high_water: int = None, batch_window_ms: float = None):
+        self.sio = sio
+        self.max_size = max_size or settings.OUTBOUND_QUEUE_MAX_SIZE
+        self.transport_high_water = transport_high_water or settings.OUTBOUND_TRANSPORT_HIGH_WATER
+        window_ms = batch_window_ms if batch_window_ms is not None else settings.SOCKET_BATCH_WINDOW_MS
+        self.batch_window = window_ms / 1000
+        self._queues: dict[str, deque] = {}
+        self._drains: dict[str, asyncio.Task] = {}
+        self._evicted: set[str] = set()
+        self._disconnects: set[asyncio.Task] = set()  # strong references until each task finishes
+        self._last_flush: dict[str, float] = {}  # batching sid -> loop time of its last frame
+        self.stats = {
+            "sent": 0,
+            "dropped_typing": 0,
+            "evicted": 0,
+            "high_watermark": 0,
+            "batches": 0,
+            "batched_events": 0,
+        }
+
+    def enable_batching(self, sid: str):
+        self._last_flush[sid] = 0.0
+
+    def enqueue(self, sid: str, event: str, payload) -> bool:
+        """Queue an event for a session; returns False if it was dropped"""
+        if sid in self._evicted:
+            return False
+        queue = self._queues.setdefault(sid, deque())
+        if len(queue) >= self.max_size and not self._make_room(sid, queue, event):
+            return False
+        queue.append((event, payload, time.perf_counter()))
+        if len(queue) > self.stats["high_watermark"]:
+            self.stats["high_watermark"] = len(queue)
+        if sid not in self._drains:
+            self._drains[sid] = asyncio.create_task(self._drain(sid))
+        return True
+
+    def _make_room(self, sid: str, queue: deque, event: str) -> bool:
+        if event in DROPPABLE_EVENTS:
+            self.stats["dropped_typing"] += 1
+            return False
+        for index, (queued_event, _, _) in enumerate(queue):
+            if queued_event in DROPPABLE_EVENTS:
+                del queue[index]
+                self.stats["dropped_typing"] += 1
+                return True
+        self._evict(sid)
+        return False
+
+    def _evict(self, sid: str):
+        logger.warning(f"Disconnecting slow consumer {sid}: outbound queue full")
+        self.stats["evicted"] += 1
+        self._evicted.add(sid)
+        self._queues.pop(sid, None)
+        task = asyncio.create_task(self._disconnect(sid))
+        self._disconnects.add(task)
+        task.add_done_callback(self._disconnects.discard)
+
+    async def _disconnect(self, sid: str):
+        try:
+            await self.sio.disconnect(sid)
+        except Exception as e:
+            logger.warning(f"Failed to disconnect slow consumer {sid}: {e}")
+
+    def _transport_backlog(self, sid: str) -> int:
+        eio_sid = self.sio.manager.eio_sid_from_sid(sid, "/")
+        socket = self.sio.eio.sockets.get(eio_sid) if eio_sid else None
+        return socket.queue.qsize() if socket is not None else 0
+
+    async def _drain(self, sid: str):
+        try:
+            while True:
+                queue = self._queues.get(sid)
+                if not queue:
+                    break
+                while self._transport_backlog(sid) >= self.transport_high_water:
+                    await asyncio.sleep(0.01)
+                    if sid not in self._queues:
+                        return
+                if sid in self._last_flush:
+                    await self._flush_batch(sid, queue)
+                    continue
+                event, payload, enqueued_at = queue.popleft()
+                try:
+                    await self.sio.emit(event, payload, to=sid)
+                    self.stats["sent"] += 1
+                    # Time spent queued plus handing the packet to the transport
+                    realtime_metrics.record_emit((time.perf_counter() - enqueued_at) * 1000)
+                except Exception as e:
+                    logger.warning(f"Failed to emit {event} to {sid}: {e}")
+        finally:
+            self._drains.pop(sid, None)
+            if not self._queues.get(sid):
+                self._queues.pop(sid, None)
+
+    async def _flush_batch(self, sid: str, queue: deque):
+        loop = asyncio.get_running_loop()
+        # Inside the window of the previous frame: wait for it to close and collect what arrives
+        wait = self._last_flush[sid] + self.batch_window - loop.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+            if self._queues.get(sid) is not queue:
+                return
+        items = list(queue)
+        queue.clear()
+        self._last_flush[sid] = loop.time()
+        try:
+            if len(items) == 1:
+                event, payload, _ = items[0]
+                await self.sio.emit(event, payload, to=sid)
+            else:
+                await self.sio.emit(
+                    SocketEvents.BATCH, [{"event": event, "data": payload} for event, payload, _ in items], to=sid,
+                )
+                self.stats["batches"] += 1
+                self.stats["batched_events"] += len(items)
+            self.stats["sent"] += len(items)
+            now = time.perf_counter()
+            for _, _, enqueued_at in items:
+                realtime_metrics.record_emit((now - enqueued_at) * 1000)
+        except Exception as e:
+            logger.warning(f"Failed to emit {len(items)} queued events to {sid}: {e}")
+
+    def discard(self, sid: str):
+        """Forget a disconnected session and stop its drain task"""
+        self._queues.pop(sid, None)
+        self._evicted.discard(sid)
+        self._last_flush.pop(sid, None)
+        task = self._drains.pop(sid, None)
+        if task is not None:
+            task.cancel()
+
+    async def wait_empty(self, timeout: float) -> bool:
+        """Wait until every queue has been handed to the transport; returns False on timeout"""
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self._drains:
+            if asyncio.get_running_loop().time() >= deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    def depth(self, sid: str) -> int:
+        return len(self._queues.get(sid, ()))
+
+    def get_metrics(self, top: int = 10) -> dict:
+        """Queue-depth snapshot for the metrics endpoint; session ids are left out"""
+        depths = [len(queue) for queue in self._queues.values() if queue]
+        deepest = sorted(depths, reverse=True)[:top]
+        return {
+            "max_size": self.max_size,
+            "backlogged_sessions": len(depths),
+            "queued_events": sum(depths),
+            "max_depth": deepest[0] if deepest else 0,
+            "deepest": deepest,
+            **self.stats,
+        }
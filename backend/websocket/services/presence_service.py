@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from datetime import datetime
+from core.config import settings
+from database.session import SessionLocal
+from database.models import Friendship
+from websocket.events import SocketEvents
+from websocket.services.connection_service import ConnectionService
+from websocket.services.fanout_service import FanoutService
+
+logger = logging.getLogger(__name__)
+
+class PresenceService:
+    """Tells online friends when a user comes online or goes offline
+
+    Only the worker whose connect or disconnect moved the user between zero
+    and one sessions across all workers marks them, so a user with sockets on
+    several workers is announced once. After the debounce window the real
+    state is compared with the state before the first change, so a
+    reconnecting phone produces no event at all, and every change in the
+    window is delivered to each friend in one presence_update.
+    """
+
+    def __init__(self, connection_service: ConnectionService, fanout_service: FanoutService, debounce_seconds: float = None):
+        self.connection_service = connection_service
+        self.fanout_service = fanout_service
+        self.debounce_seconds = settings.PRESENCE_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        self._pending: dict[int, bool] = {}  # user_id -> online before the first change in the window
+        self._flush_task: asyncio.Task | None = None
+
+    def mark_changed(self, user_id: int, online: bool):
+        """Schedule an announcement for a user who just came online or went offline"""
+        self._pending.setdefault(user_id, not online)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.debounce_seconds)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Failed to broadcast presence: {e}")
+
+    async def flush(self) -> int:
+        """Announce the pending users whose state differs from before the window"""
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        online = await self.connection_service.get_online_user_ids(pending)
+        changed_at = datetime.utcnow().isoformat()
+        changes = {}
+        for user_id, was_online in pending.items():
+            is_online = user_id in online
+            if is_online == was_online:
+                continue
+            changes[user_id] = {"user_id": user_id, "online": is_online, "changed_at": changed_at}
+        if not changes:
+            return 0
+
+        friends_by_user = await asyncio.to_thread(self.get_friend_ids, list(changes))
+        batches: dict[int, list[dict]] = {}
+        for user_id, change in changes.items():
+            for friend_id in friends_by_user.get(user_id, []):
+                batches.setdefault(friend_id, []).append(change)
+        if not batches:
+            return 0
+
+        recipients = await self.connection_service.get_online_user_ids(batches)
+        payloads = {uid: {"changes": batches[uid]} for uid in recipients}
+        return await self.fanout_service.emit_to_user_rooms(SocketEvents.PRESENCE_UPDATE, payloads)
+
+    @staticmethod
+    def get_friend_ids(user_ids: list[int]) -> dict[int, list[int]]:
+        """Get the friends of many users in a single query"""
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(Friendship.user_id, Friendship.friend_id)
+                .filter(Friendship.user_id.in_(user_ids))
+                .all()
+            )
+            friends: dict[int, list[int]] = {}
+            for user_id, friend_id in rows:
+                friends.setdefault(user_id, []).append(friend_id)
+            return friends
+        finally:
+            db.close()
+
+    async def close(self):
+        """Drop the pending flush"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
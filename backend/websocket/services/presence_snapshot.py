@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from core.config import settings
+from database.session import SessionLocal
+from database.models import UserPresence
+from websocket.services.connection_service import ConnectionService
+from websocket.services.presence_service import PresenceService
+
+logger = logging.getLogger(__name__)
+
+class PresenceSnapshotService:
+    """Persists connection metadata so a restart does not flicker everyone offline
+
+    Users whose presence changed are written to user_presence every
+    PRESENCE_SNAPSHOT_INTERVAL_SECONDS, and every connected user is written
+    right before shutdown. On startup, users that were connected in a recent
+    snapshot stay online for PRESENCE_RECONNECT_GRACE_SECONDS. Their friends
+    see nothing while they reconnect, and users who never come back are
+    announced offline when the grace ends.
+    """
+
+    def __init__(self, connection_service: ConnectionService, presence_service: PresenceService):
+        self.connection_service = connection_service
+        self.presence_service = presence_service
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        """Restore the previous snapshot and start periodic snapshots"""
+        restored = self.restore()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(bool(restored)))
+
+    async def _run(self, has_grace: bool):
+        interval = settings.PRESENCE_SNAPSHOT_INTERVAL_SECONDS
+        grace_deadline = asyncio.get_running_loop().time() + settings.PRESENCE_RECONNECT_GRACE_SECONDS
+        while True:
+            await asyncio.sleep(min(interval, settings.PRESENCE_RECONNECT_GRACE_SECONDS) if has_grace else interval)
+            if has_grace and asyncio.get_running_loop().time() >= grace_deadline:
+                has_grace = False
+                for user_id in self.connection_service.expire_restored():
+                    self.presence_service.mark_changed(user_id, False)
+            try:
+                await self.snapshot()
+            except Exception as e:
+                logger.warning(f"Failed to snapshot presence: {e}")
+
+    async def snapshot(self, everyone: bool = False) -> int:
+        """Write changed users (or every known user) to user_presence"""
+        service = self.connection_service
+        user_ids = set(service.presence_dirty)
+        if everyone:
+            user_ids |= set(service.active_connections) | set(service.restored_until)
+        service.presence_dirty.difference_update(user_ids)
+        if not user_ids:
+            return 0
+
+        now = datetime.utcnow()
+        typing = service.export_typing()
+        rows = []
+        for user_id in user_ids:
+            sessions = len(service.active_connections.get(user_id, ()))
+            if not sessions and user_id in service.restored_until:
+                sessions = 1
+            rows.append({
+                "user_id": user_id,
+                "last_seen": now if sessions else service.last_seen.get(user_id, now),
+                "session_count": sessions,
+                "typing": typing.get(user_id),
+                "updated_at": now,
+            })
+        await asyncio.to_thread(self._write, rows)
+        return len(rows)
+
+    @staticmethod
+    def _write(rows: list[dict]):
+        db = SessionLocal()
+        try:
+            statement = sqlite_insert(UserPresence).values(rows)
+            db.execute(statement.on_conflict_do_update(
+                index_elements=[UserPresence.user_id],
+                set_={
+                    "last_seen": statement.excluded.last_seen,
+                    "session_count": statement.excluded.session_count,
+                    "typing": statement.excluded.typing,
+                    "updated_at": statement.excluded.updated_at,
+                },
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def restore(self) -> list[int]:
+        """Load users that were online in a recent snapshot into the reconnect grace"""
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.PRESENCE_RESTORE_MAX_AGE_SECONDS)
+        db = SessionLocal()
+        try:
+            rows = db.query(UserPresence).filter(
+                UserPresence.session_count > 0,
+                UserPresence.updated_at >= cutoff,
+            ).all()
+            restored = [row.user_id for row in rows]
+            for row in rows:
+                self.connection_service.last_seen[row.user_id] = row.last_seen
+                self.connection_service.import_typing(row.user_id, row.typing)
+        finally:
+            db.close()
+
+        self.connection_service.restore_presence(restored, settings.PRESENCE_RECONNECT_GRACE_SECONDS)
+        return restored
+
+    async def close(self, final_snapshot: bool = False):
+        """Stop periodic snapshots, optionally writing every connected user first"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if final_snapshot:
+            await self.snapshot(everyone=True)
+
+    @staticmethod
+    def get_last_seen(user_ids: list[int]) -> dict[int, datetime]:
+        """Last seen times from the snapshot table, for users without a live socket"""
+        if not user_ids:
+            return {}
+        db = SessionLocal()
+        try:
+            rows = db.query(UserPresence.user_id, UserPresence.last_seen).filter(
+                UserPresence.user_id.in_(user_ids)
+            ).all()
+            return {user_id: last_seen for user_id, last_seen in rows if last_seen is not None}
+        finally:
+            db.close()
@@ -0,0 +1,118 @@
+import time
+from core.config import settings
+
+
+def parse_limits(spec: str) -> dict[str, tuple[float, float]]:
+    """Parse "event=rate/burst,..." into {event: (tokens per second, bucket size)}"""
+    limits = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        event, budget = item.split("=")
+        rate, burst = budget.split("/")
+        limits[event.strip()] = (float(rate), float(burst))
+    return limits
+
+
+class RateLimiter:
+    """Token buckets per session and per user, with a separate budget per event type
+
+    Each bucket is a three-item list [tokens, last_refill, rejection_sent], so
+    a check is O(1) and refills lazily. A user's bucket is the session budget
+    times SOCKET_USER_RATE_MULTIPLIER, which caps clients that open many tabs.
+
+    A user's buckets outlive their last session until they would have refilled,
+    so disconnecting and reconnecting doesn't hand out a fresh budget.
+    """
+
+    def __init__(self, limits: dict[str, tuple[float, float]] = None, user_multiplier: float = None):
+        self.limits = limits if limits is not None else parse_limits(settings.SOCKET_RATE_LIMITS)
+        self.user_multiplier = user_multiplier or settings.SOCKET_USER_RATE_MULTIPLIER
+        self._sessions: dict[str, dict[str, list]] = {}
+        self._users: dict[int, dict[str, list]] = {}
+        self._released: dict[int, float] = {}  # offline user -> when their buckets are full again
+        self.rejected: dict[str, int] = {}
+
+    @staticmethod
+    def _take(buckets: dict[str, list], event: str, rate: float, burst: float, now: float) -> bool:
+        bucket = buckets.get(event)
+        if bucket is None:
+            bucket = buckets[event] = [burst, now, False]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            bucket[2] = False
+            return True
+        return False
+
+    def allow(self, sid: str, user_id: int | None, event: str, now: float = None) -> bool:
+        """Spend one token for an event; events without a budget are always allowed"""
+        limit = self.limits.get(event)
+        if limit is None:
+            return True
+        now = time.monotonic() if now is None else now
+        rate, burst = limit
+        allowed = self._take(self._sessions.setdefault(sid, {}), event, rate, burst, now)
+        if allowed and user_id is not None:
+            m = self.user_multiplier
+            allowed = self._take(self._users.setdefault(user_id, {}), event, rate * m, burst * m, now)
+            if not allowed:
+                # Give the session its token back; the user-level budget is what ran out
+                self._sessions[sid][event][0] += 1
+        if not allowed:
+            self.rejected[event] = self.rejected.get(event, 0) + 1
+        return allowed
+
+    def should_notify(self, sid: str, event: str) -> bool:
+        """Whether to tell the client about a rejection; once per exhausted bucket, not per event"""
+        bucket = self._sessions.get(sid, {}).get(event)
+        if bucket is None or bucket[2]:
+            return False
+        bucket[2] = True
+        return True
+
+    def retry_after(self, event: str) -> float:
+        rate, _ = self.limits[event]
+        return round(1 / rate, 3) if rate > 0 else None
+
+    def discard_session(self, sid: str):
+        self._sessions.pop(sid, None)
+
+    def _refilled_at(self, buckets: dict[str, list]) -> float:
+        """Monotonic time at which every bucket of a user is full again"""
+        refilled_at = 0.0
+        for event, (tokens, last_refill, _) in buckets.items():
+            rate, burst = self.limits.get(event, (0.0, 0.0))
+            rate, burst = rate * self.user_multiplier, burst * self.user_multiplier
+            if tokens < burst:
+                refilled_at = max(refilled_at, last_refill + (burst - tokens) / rate if rate > 0 else float("inf"))
+        return refilled_at
+
+    def release_user(self, user_id: int, now: float = None):
+        """The user's last session closed: forget their buckets once they have refilled"""
+        now = time.monotonic() if now is None else now
+        self._prune_users(now)
+        buckets = self._users.get(user_id)
+        if buckets is None:
+            return
+        refilled_at = self._refilled_at(buckets)
+        if refilled_at <= now:
+            del self._users[user_id]
+            return
+        self._released.pop(user_id, None)
+        self._released[user_id] = refilled_at
+
+    def _prune_users(self, now: float):
+        # Roughly expiry-ordered (refill times differ by at most a bucket's refill time), so stop at the first live one
+        while self._released:
+            user_id, refilled_at = next(iter(self._released.items()))
+            if refilled_at > now:
+                break
+            del self._released[user_id]
+            buckets = self._users.get(user_id)
+            # Spent again after a reconnect: kept, and scheduled again at the next release
+            if buckets is not None and self._refilled_at(buckets) <= now:
+                del self._users[user_id]
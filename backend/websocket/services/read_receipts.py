@@ -0,0 +1,57 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+FlushCallback = Callable[[int, int, int], Awaitable[None]]
+
+class ReadReceiptCoalescer:
+    """Collapses read receipts into one "read up to" per user and conversation
+
+    The first receipt for a (user, conversation) pair opens a window of
+    READ_RECEIPT_WINDOW_MS; receipts arriving inside it only raise the
+    high-water mark. When the window closes the callback runs once with
+    (user_id, conversation_id, read_up_to).
+    """
+
+    def __init__(self, flush: FlushCallback, window_ms: float = None):
+        self._flush = flush
+        self.window = (window_ms if window_ms is not None else settings.READ_RECEIPT_WINDOW_MS) / 1000
+        self._pending: dict[tuple[int, int], int] = {}
+        self._timers: dict[tuple[int, int], asyncio.Task] = {}
+        self.received = 0
+        self.flushed = 0
+
+    def add(self, user_id: int, conversation_id: int, message_id: int):
+        """Record that a user has read a conversation up to message_id"""
+        key = (user_id, conversation_id)
+        self.received += 1
+        self._pending[key] = max(message_id, self._pending.get(key, 0))
+        if key not in self._timers:
+            self._timers[key] = asyncio.create_task(self._flush_later(key))
+
+    async def _flush_later(self, key: tuple[int, int]):
+        await asyncio.sleep(self.window)
+        await self.flush_key(key)
+
+    async def flush_key(self, key: tuple[int, int]):
+        self._timers.pop(key, None)
+        read_up_to = self._pending.pop(key, None)
+        if read_up_to is None:
+            return
+        self.flushed += 1
+        try:
+            await self._flush(key[0], key[1], read_up_to)
+        except Exception as e:
+            logger.warning(f"Failed to flush read receipts for {key}: {e}")
+
+    async def close(self):
+        """Flush every pending receipt now instead of waiting for its window"""
+        timers = list(self._timers.values())
+        for key in list(self._pending):
+            await self.flush_key(key)
+        for timer in timers:
+            timer.cancel()
+        await asyncio.gather(*timers, return_exceptions=True)
@@ -24,7 +24,8 @@ export function initializeSocket() {
     reconnectionDelayMax: 5000,
     reconnectionAttempts: 5,
     reconnectionDelayJitter: true,
-    auth: token ? { token: token } : undefined,
+    // batch: the server may deliver several events in one "batch" frame
+    auth: token ? { token: token, batch: true } : undefined,
     transports: ['websocket', 'polling'],
   });
 
@@ -40,6 +41,13 @@ export function initializeSocket() {
     console.error('WebSocket error:', error);
   });
 
+  // Replay batched events, in order, to the listeners of each event
+  socket.on('batch', (events: { event: string; data: any }[]) => {
+    for (const { event, data } of events) {
+      socket?.listeners(event).forEach((listener) => listener(data));
+    }
+  });
+
   return socket;
 }
 